@@ -0,0 +1,308 @@
+"""
+End-to-end benchmarks for the NeuroShard CLI.
+
+Generates synthetic model-like files, runs every CLI command against them
+(push/pull go through a locally launched neuroshard.server.app with simulated
+latency) and records wall time, throughput, peak RSS and dedup ratio.
+
+Usage:
+    python benchmarks/bench.py --size-mb 32 --output bench.json
+    python benchmarks/bench.py --size-mb 32 --compare bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+from typing import Dict, Any, List, Optional, Tuple
+
+MB = 1024 * 1024
+KINDS = ["random", "low-entropy", "fp16"]
+VARIANTS = ["mutated", "shifted"]
+
+SERVER_SNIPPET = """
+import sys, asyncio, uvicorn
+from neuroshard.server.app import app
+
+latency = float(sys.argv[2]) / 1000.0
+
+@app.middleware("http")
+async def simulated_latency(request, call_next):
+    if latency:
+        await asyncio.sleep(latency)
+    return await call_next(request)
+
+uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+# Runs the CLI in-process and records its own peak RSS on exit. VmHWM is used
+# where available because ru_maxrss is inherited from the parent across fork.
+CLI_SNIPPET = """
+import sys, runpy, resource
+out = sys.argv.pop(1)
+sys.argv[0] = "nshard"
+try:
+    runpy.run_module("neuroshard.cli", run_name="__main__")
+finally:
+    kb = 0
+    try:
+        with open("/proc/self/status") as f:
+            kb = next(int(l.split()[1]) for l in f if l.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            kb //= 1024
+    with open(out, "w") as f:
+        f.write(str(kb))
+"""
+
+# --- Synthetic data ---------------------------------------------------------
+
+def generate(kind: str, size: int, seed: int) -> bytes:
+    """Generate `size` bytes of synthetic model-like data."""
+    rng = random.Random(seed)
+    if kind == "random":
+        return rng.getrandbits(size * 8).to_bytes(size, "little")
+    if kind == "low-entropy":
+        # A small alphabet with long runs, like sparse or quantized weights.
+        tile = bytes(rng.choice(b"\x00\x00\x00\x01\x02\x7f") for _ in range(64 * 1024))
+        data = bytearray(tile * (size // len(tile) + 1))[:size]
+        for _ in range(size // 4096):
+            data[rng.randrange(size)] = rng.getrandbits(8)
+        return bytes(data)
+    if kind == "fp16":
+        # Random mantissas with exponents confined to a typical weight range
+        # (|x| in roughly [2^-6, 2^0)), little-endian.
+        data = bytearray(rng.getrandbits(size * 8).to_bytes(size, "little"))
+        table = bytes(
+            (b & 0x80) | ((9 + (b >> 2) % 6) << 2) | (b & 0x03)
+            for b in range(256)
+        )
+        data[1::2] = data[1::2].translate(table)
+        return bytes(data)
+    raise ValueError(f"Unknown data kind: {kind}")
+
+def next_version(data: bytes, variant: str, seed: int) -> bytes:
+    """Derive a successive checkpoint from `data`."""
+    rng = random.Random(seed)
+    if variant == "shifted":
+        # Insert a small header, shifting every block boundary.
+        return rng.getrandbits(8 * 137).to_bytes(137, "little") + data
+    if variant == "mutated":
+        # Rewrite ~2% of the file in scattered 4KB windows.
+        out = bytearray(data)
+        window = 4096
+        for _ in range(max(1, len(data) // window // 50)):
+            pos = rng.randrange(max(1, len(data) - window))
+            out[pos:pos + window] = rng.getrandbits(window * 8).to_bytes(window, "little")
+        return bytes(out)
+    raise ValueError(f"Unknown variant: {variant}")
+
+# --- Measurement helpers ----------------------------------------------------
+
+def dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def run_cli(args: List[str], cwd: str) -> Dict[str, Any]:
+    """Run `nshard <args>` in a subprocess and return its wall time and peak RSS."""
+    with tempfile.TemporaryFile() as err, tempfile.NamedTemporaryFile("r") as rss:
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", CLI_SNIPPET, rss.name, *args],
+            cwd=cwd, stdout=subprocess.DEVNULL, stderr=err,
+        )
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            err.seek(0)
+            raise RuntimeError(f"nshard {' '.join(args)} failed:\n{err.read().decode()}")
+        rss_kb = int(rss.read() or 0)
+    return {"seconds": elapsed, "peak_rss_kb": rss_kb}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(cwd: str, latency_ms: float, env: Optional[Dict[str, str]] = None) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SERVER_SNIPPET, str(port), str(latency_ms)],
+        cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, **(env or {})},
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/manifests/ping")
+        except urllib.error.HTTPError:
+            return proc, url  # Any HTTP response means the server is up.
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("Server did not start.")
+
+# --- Scenario ---------------------------------------------------------------
+
+def run_scenario(kind: str, variant: str, size: int, latency_ms: float, seed: int) -> List[Dict[str, Any]]:
+    results = []
+    workdir = tempfile.mkdtemp(prefix="nshard-bench-")
+    work = os.path.join(workdir, "work")
+    clone = os.path.join(workdir, "clone")
+    server_dir = os.path.join(workdir, "server")
+    for d in (work, clone, server_dir):
+        os.makedirs(d)
+
+    server, url = start_server(server_dir, latency_ms)
+    try:
+        target = os.path.join(work, "model.bin")
+        objects = os.path.join(work, ".shard", "objects")
+        remote_objects = os.path.join(server_dir, "server_storage", "objects")
+
+        def record(command: str, args: List[str], cwd: str = work, nbytes: int = size):
+            m = run_cli(args, cwd)
+            row = {
+                "kind": kind,
+                "variant": variant,
+                "command": command,
+                "bytes": nbytes,
+                "throughput_mb_s": (nbytes / MB) / m["seconds"] if m["seconds"] else 0.0,
+                **m,
+            }
+            results.append(row)
+            return row
+
+        v1 = generate(kind, size, seed)
+        with open(target, "wb") as f:
+            f.write(v1)
+
+        record("init", ["init"], nbytes=0)
+        record("track", ["track", "model.bin"], nbytes=0)
+
+        before = dir_size(objects)
+        row = record("commit", ["commit", "-m", "v1"])
+        row["stored_bytes"] = dir_size(objects) - before
+
+        v2 = next_version(v1, variant, seed + 1)
+        with open(target, "wb") as f:
+            f.write(v2)
+        size2 = len(v2)
+
+        record("status", ["status"], nbytes=0)
+        record("diff", ["diff", "model.bin"], nbytes=size2)
+
+        before = dir_size(objects)
+        row = record("commit-incremental", ["commit", "-m", "v2"], nbytes=size2)
+        row["stored_bytes"] = dir_size(objects) - before
+        row["dedup_ratio"] = size2 / row["stored_bytes"] if row["stored_bytes"] else float(size2)
+
+        before = dir_size(remote_objects)
+        row = record("push", ["push", "--remote", url], nbytes=size2)
+        row["transferred_bytes"] = dir_size(remote_objects) - before
+
+        os.remove(target)
+        record("checkout", ["checkout", "model.bin.shard.json"], nbytes=size2)
+
+        shutil.copy(os.path.join(work, "model.bin.shard.json"), clone)
+        row = record("pull", ["pull", "--remote", url, "model.bin.shard.json"], cwd=clone, nbytes=size2)
+        row["transferred_bytes"] = dir_size(os.path.join(clone, ".shard", "objects"))
+        record("checkout-clone", ["checkout", "model.bin.shard.json"], cwd=clone, nbytes=size2)
+
+        record("stats", ["stats", "--json"], nbytes=0)
+        record("gc", ["gc"], nbytes=0)
+    finally:
+        server.kill()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+# --- Reporting --------------------------------------------------------------
+
+def print_table(results: List[Dict[str, Any]]):
+    header = f"{'kind':<12} {'variant':<8} {'command':<19} {'sec':>8} {'MB/s':>9} {'RSS MB':>8} {'dedup':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        dedup = f"{r['dedup_ratio']:.2f}x" if "dedup_ratio" in r else ""
+        print(
+            f"{r['kind']:<12} {r['variant']:<8} {r['command']:<19} {r['seconds']:>8.3f} "
+            f"{r['throughput_mb_s']:>9.1f} {r['peak_rss_kb'] / 1024:>8.1f} {dedup:>7}"
+        )
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> bool:
+    """Print per-command changes against a previous run. Returns False on regression."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda r: (r["kind"], r["variant"], r["command"])
+    base = {key(r): r for r in baseline["results"]}
+
+    ok = True
+    print(f"\nComparison against {baseline_path} (threshold {threshold:.0%}):")
+    for r in results:
+        b = base.get(key(r))
+        if b is None or not b["seconds"]:
+            continue
+        change = (r["seconds"] - b["seconds"]) / b["seconds"]
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"  {'/'.join(key(r)):<40} {b['seconds']:>8.3f}s -> {r['seconds']:>8.3f}s ({change:+.1%}){flag}")
+    return ok
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="NeuroShard end-to-end benchmarks")
+    parser.add_argument("--size-mb", type=float, default=32, help="Size of each synthetic model file")
+    parser.add_argument("--kinds", nargs="+", default=KINDS, choices=KINDS)
+    parser.add_argument("--variants", nargs="+", default=VARIANTS, choices=VARIANTS)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated per-request server latency")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Compare against a previous JSON result file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown counted as regression")
+    args = parser.parse_args(argv)
+
+    size = int(args.size_mb * MB)
+    results = []
+    for kind in args.kinds:
+        for variant in args.variants:
+            results.extend(run_scenario(kind, variant, size, args.latency_ms, args.seed))
+
+    print_table(results)
+
+    if args.output:
+        from neuroshard import __version__
+        report = {
+            "meta": {
+                "neuroshard_version": __version__,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "size_bytes": size,
+                "latency_ms": args.latency_ms,
+                "seed": args.seed,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare:
+        return 0 if compare(results, args.compare, args.threshold) else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
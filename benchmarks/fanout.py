@@ -0,0 +1,122 @@
+"""
+Fan-out load test for the server's hot-block cache.
+
+Simulates a fleet of clients pulling the same freshly pushed model at once:
+every client downloads every block, in the same order, concurrently. Runs
+once per cache size (0 disables the cache) and reports throughput, request
+latency and the server's cache counters from /metrics.
+
+Usage:
+    python benchmarks/fanout.py --clients 100 --blocks 16
+    python benchmarks/fanout.py --cache-mb 0 512 --output fanout.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import requests
+
+from bench import MB, start_server
+
+CACHE_COUNTERS = ("hits", "misses", "coalesced")
+
+def scrape_cache(url: str) -> Dict[str, int]:
+    with urllib.request.urlopen(f"{url}/metrics") as resp:
+        text = resp.read().decode()
+    values = {}
+    for line in text.splitlines():
+        for name in CACHE_COUNTERS:
+            if line.startswith(f"neuroshard_cache_{name}_total "):
+                values[name] = int(float(line.split()[1]))
+    return values
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def run(cache_mb: float, clients: int, blocks: int, block_size: int, latency_ms: float) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="nshard-fanout-")
+    proc, url = start_server(workdir, latency_ms, env={"NEUROSHARD_SERVER_CACHE_MB": str(cache_mb)})
+    try:
+        hashes = []
+        with requests.Session() as session:
+            for _ in range(blocks):
+                data = os.urandom(block_size)
+                h = hashlib.sha256(data).hexdigest()
+                session.put(f"{url}/blocks/{h}", data=data).raise_for_status()
+                hashes.append(h)
+
+        latencies = []
+        lock = threading.Lock()
+
+        def client(_):
+            mine = []
+            with requests.Session() as session:
+                for h in hashes:
+                    start = time.perf_counter()
+                    resp = session.get(f"{url}/blocks/{h}")
+                    resp.raise_for_status()
+                    mine.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(mine)
+
+        before = scrape_cache(url)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            list(pool.map(client, range(clients)))
+        elapsed = time.perf_counter() - start
+        after = scrape_cache(url)
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    served = clients * blocks * block_size
+    counters = {name: after.get(name, 0) - before.get(name, 0) for name in CACHE_COUNTERS}
+    return {
+        "cache_mb": cache_mb,
+        "clients": clients,
+        "blocks": blocks,
+        "seconds": elapsed,
+        "mb_per_s": served / MB / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "disk_reads": counters["misses"],
+        **counters,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="NeuroShard server fan-out load test")
+    parser.add_argument("--clients", type=int, default=100, help="Concurrent clients")
+    parser.add_argument("--blocks", type=int, default=16, help="Blocks each client downloads")
+    parser.add_argument("--block-mb", type=float, default=4, help="Size of each block")
+    parser.add_argument("--cache-mb", type=float, nargs="+", default=[0, 512], help="Server cache sizes to compare")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated per-request server latency")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = [run(mb, args.clients, args.blocks, int(args.block_mb * MB), args.latency_ms) for mb in args.cache_mb]
+
+    print(f"{'cache MB':>9} {'seconds':>8} {'MB/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'disk reads':>10} {'hits':>7} {'coalesced':>9}")
+    for r in results:
+        print(f"{r['cache_mb']:>9g} {r['seconds']:>8.2f} {r['mb_per_s']:>9.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['disk_reads']:>10} {r['hits']:>7} {r['coalesced']:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+        print(f"\nWrote {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+Library API for committing checkpoints from inside a training loop.
+
+    from neuroshard.api import Checkpointer
+
+    with Checkpointer(remote="http://localhost:8000") as ckpt:
+        for step in range(steps):
+            train_step()
+            if step % 1000 == 0:
+                buf = io.BytesIO()
+                torch.save(model.state_dict(), buf)
+                ckpt.commit_async(buf.getbuffer(), file_path="model.pt", message=f"step {step}")
+
+Commits run on a background thread and new blocks are streamed to the remote
+while training continues. CPU use is bounded by `cpu_workers` compression
+threads and memory by `max_pending_bytes` of blocks awaiting upload and
+`max_queued_commits` commits waiting to start.
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from neuroshard.core import profile
+from neuroshard.core.chunker import make_block, iter_file_chunks, iter_buffer_chunks
+from neuroshard.core.fsutil import atomic_write
+from neuroshard.core.index import Index
+from neuroshard.core.manifest import create_manifest
+from neuroshard.core.metadb import MetaDB
+from neuroshard.core.store import LocalStore
+
+Source = Union[str, bytes, bytearray, memoryview]
+
+class CommitResult:
+    """Outcome of a commit. `uploaded` resolves once the manifest is on the remote."""
+
+    def __init__(self, manifest_hash: str, manifest: Dict[str, Any], manifest_path: Optional[str],
+                 uploaded: Optional[Future] = None):
+        self.manifest_hash = manifest_hash
+        self.manifest = manifest
+        self.manifest_path = manifest_path
+        self.uploaded = uploaded
+
+class _ByteBudget:
+    """Blocks producers while more than `limit` bytes are in flight."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.pending = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes: int):
+        with self._cond:
+            # A single oversized item is still admitted once nothing else is pending.
+            while self.pending and self.pending + nbytes > self.limit:
+                self._cond.wait()
+            self.pending += nbytes
+            profile.gauge("uploader.pending_bytes", self.pending)
+
+    def release(self, nbytes: int):
+        with self._cond:
+            self.pending -= nbytes
+            self._cond.notify_all()
+
+class BackgroundUploader:
+    """
+    Uploads blocks to a remote on worker threads, then each manifest once all
+    of its blocks have landed.
+    """
+
+    def __init__(self, client, workers: int = 4, max_pending_bytes: int = 256 * 1024 * 1024):
+        self.client = client
+        self.budget = _ByteBudget(max_pending_bytes)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nshard-upload")
+        self._lock = threading.Lock()
+        self._on_remote = set()
+
+    def submit_block(self, obj_hash: str, data: bytes) -> Future:
+        """Queue a block for upload. Blocks while the memory budget is exhausted."""
+        nbytes = len(data)
+        self.budget.acquire(nbytes)
+        future = self.pool.submit(self._upload_block, obj_hash, data)
+        future.add_done_callback(lambda _: self.budget.release(nbytes))
+        return future
+
+    def _upload_block(self, obj_hash: str, data: bytes):
+        with self._lock:
+            if obj_hash in self._on_remote:
+                return
+        if not self.client.has_block(obj_hash):
+            self.client.upload_block(obj_hash, data)
+        with self._lock:
+            self._on_remote.add(obj_hash)
+
+    def submit_manifest(self, manifest_hash: str, data: bytes, block_futures: List[Future]) -> Future:
+        """Upload a manifest after `block_futures` succeed. Returns a future for the whole upload."""
+        done = Future()
+        remaining = [len(block_futures)]
+        lock = threading.Lock()
+
+        def upload_manifest():
+            try:
+                self.client.upload_manifest(manifest_hash, data)
+                done.set_result(manifest_hash)
+            except BaseException as e:
+                done.set_exception(e)
+
+        def block_done(future: Future):
+            error = future.exception()
+            with lock:
+                if done.done():
+                    return
+                if error is not None:
+                    done.set_exception(error)
+                    return
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self.pool.submit(upload_manifest)
+
+        if not block_futures:
+            self.pool.submit(upload_manifest)
+        for future in block_futures:
+            future.add_done_callback(block_done)
+        return done
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+class Checkpointer:
+    """
+    Commits files or in-memory buffers to the local store in the background,
+    optionally streaming new blocks to a remote as they are produced.
+    """
+
+    def __init__(
+        self,
+        remote: Optional[str] = None,
+        token: Optional[str] = None,
+        root_dir: str = ".shard",
+        cpu_workers: int = 2,
+        upload_workers: int = 4,
+        max_pending_bytes: int = 256 * 1024 * 1024,
+        max_queued_commits: int = 2,
+        write_manifest_files: bool = True,
+    ):
+        self.root_dir = root_dir
+        self.store = LocalStore(root_dir)
+        self.store.init()
+        self.cpu_workers = max(1, cpu_workers)
+        self.write_manifest_files = write_manifest_files
+
+        self.uploader = None
+        if remote:
+            from neuroshard.core.remote import RemoteClient
+            self.uploader = BackgroundUploader(RemoteClient(remote, token), upload_workers, max_pending_bytes)
+
+        # Commits run one at a time, in order; compression fans out to cpu_workers.
+        self._commits = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nshard-commit")
+        self._cpu = ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix="nshard-compress")
+        self._queued = threading.BoundedSemaphore(max(1, max_queued_commits))
+        self._outstanding: List[Future] = []
+        self._db = None  # Created on the commit thread (sqlite connections are per-thread)
+
+    def commit_async(self, source: Source, file_path: Optional[str] = None, message: str = "",
+                     meta: Optional[Dict[str, Any]] = None) -> Future:
+        """
+        Commit a file path or a bytes-like buffer in the background.
+        Returns a Future resolving to a CommitResult once the manifest is
+        stored locally; its `uploaded` future tracks the remote upload.
+        Buffers must not be modified until the returned future completes.
+        Blocks only when `max_queued_commits` commits are already waiting.
+        """
+        if file_path is None:
+            if not isinstance(source, str):
+                raise ValueError("file_path is required when committing an in-memory buffer.")
+            file_path = source
+
+        self._queued.acquire()
+        try:
+            future = self._commits.submit(self._commit, source, file_path, message, meta or {})
+        except BaseException:
+            self._queued.release()
+            raise
+        future.add_done_callback(lambda _: self._queued.release())
+        self._outstanding.append(future)
+        return future
+
+    def commit(self, source: Source, file_path: Optional[str] = None, message: str = "",
+               meta: Optional[Dict[str, Any]] = None) -> CommitResult:
+        """Synchronous commit_async (the upload still happens in the background)."""
+        return self.commit_async(source, file_path, message, meta).result()
+
+    def _iter_blocks(self, chunks: Iterable) -> Iterable[Dict[str, Any]]:
+        """Compress chunks on the CPU pool, keeping a bounded window in flight, in order."""
+        window = deque()
+        for chunk in chunks:
+            window.append(self._cpu.submit(make_block, chunk))
+            profile.gauge("api.compress_window", len(window))
+            if len(window) >= self.cpu_workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+    def _commit(self, source: Source, file_path: str, message: str, meta: Dict[str, Any]) -> CommitResult:
+        with profile.stage("api.commit"), self.store.lock():
+            chunks = iter_file_chunks(source) if isinstance(source, str) else iter_buffer_chunks(source)
+
+            blocks = []
+            block_futures = []
+            for block in self._iter_blocks(chunks):
+                self.store.write_object(block["hash"], block["data"])
+                if self.uploader is not None:
+                    block_futures.append(self.uploader.submit_block(block["hash"], block["data"]))
+                # Keep only metadata; compressed data is released once uploaded.
+                blocks.append({k: v for k, v in block.items() if k != "data"})
+
+            mhash, manifest, manifest_bytes = create_manifest(file_path, blocks, {**meta, "message": message})
+            self.store.write_manifest(mhash, manifest_bytes)
+            if self._db is None:
+                self._db = MetaDB(self.root_dir)
+            self._db.add_manifest(mhash, manifest, blocks)
+
+            manifest_path = None
+            if self.write_manifest_files:
+                manifest_path = f"{file_path}.shard.json"
+                atomic_write(manifest_path, manifest_bytes)
+                Index(self.root_dir).add(file_path)
+
+            uploaded = None
+            if self.uploader is not None:
+                uploaded = self.uploader.submit_manifest(mhash, manifest_bytes, block_futures)
+
+        return CommitResult(mhash, manifest, manifest_path, uploaded)
+
+    def flush(self, timeout: Optional[float] = None):
+        """Wait for all submitted commits and their uploads. Raises the first error."""
+        outstanding, self._outstanding = self._outstanding, []
+        for future in outstanding:
+            result = future.result(timeout)
+            if result.uploaded is not None:
+                result.uploaded.result(timeout)
+
+    def close(self):
+        """Flush, then stop background threads."""
+        try:
+            self.flush()
+        finally:
+            if self._db is not None:
+                self._commits.submit(self._db.close).result()
+            self._commits.shutdown(wait=True)
+            self._cpu.shutdown(wait=True)
+            if self.uploader is not None:
+                self.uploader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -1,20 +1,53 @@
+import importlib
 import typer
-from neuroshard.commands import (
-    init, track, commit, checkout, status, diff, gc, push, pull, git_init
-)
+from typer.core import TyperGroup
 
-app = typer.Typer(help="NeuroShard: Git for AI models.", epilog="Developed by Shreyash")
+from neuroshard.core import profile
 
-app.add_typer(init.app, name="init")
-app.add_typer(track.app, name="track")
-app.add_typer(commit.app, name="commit")
-app.add_typer(checkout.app, name="checkout")
-app.add_typer(status.app, name="status")
-app.add_typer(diff.app, name="diff")
-app.add_typer(gc.app, name="gc")
-app.add_typer(push.app, name="push")
-app.add_typer(pull.app, name="pull")
-app.add_typer(git_init.app, name="git-init")
+# Subcommand name -> module defining its `app`. Modules are imported only when
+# their command runs, so e.g. `nshard status` never loads requests or zstandard.
+COMMANDS = {
+    "init": "neuroshard.commands.init",
+    "track": "neuroshard.commands.track",
+    "commit": "neuroshard.commands.commit",
+    "checkout": "neuroshard.commands.checkout",
+    "status": "neuroshard.commands.status",
+    "diff": "neuroshard.commands.diff",
+    "gc": "neuroshard.commands.gc",
+    "push": "neuroshard.commands.push",
+    "pull": "neuroshard.commands.pull",
+    "git-init": "neuroshard.commands.git_init",
+    "stats": "neuroshard.commands.stats",
+    "verify": "neuroshard.commands.verify",
+    "export": "neuroshard.commands.export",
+    "import": "neuroshard.commands.import_",
+    "log": "neuroshard.commands.log",
+    "serve": "neuroshard.commands.serve",
+}
+
+class LazyGroup(TyperGroup):
+    def list_commands(self, ctx):
+        return list(COMMANDS)
+
+    def get_command(self, ctx, name):
+        module_name = COMMANDS.get(name)
+        if module_name is None:
+            return None
+        module = importlib.import_module(module_name)
+        command = typer.main.get_group(module.app)
+        command.name = name
+        return command
+
+app = typer.Typer(cls=LazyGroup, help="NeuroShard: Git for AI models.", epilog="Developed by Shreyash")
+
+@app.callback()
+def main(
+    profile_: bool = typer.Option(False, "--profile", help="Print per-stage timings when the command finishes"),
+    profile_output: str = typer.Option(None, "--profile-output", help="Write profile as JSON (or Chrome trace if *.trace.json)"),
+):
+    """NeuroShard: Git for AI models."""
+    if profile_ or profile_output:
+        profile.enable(profile_output)
 
 if __name__ == "__main__":
     app()
@@ -7,7 +7,13 @@ from neuroshard.core.chunker import decompress_chunk
 app = typer.Typer()
 
 @app.callback(invoke_without_command=True)
-def checkout(manifest_file: str):
+def checkout(
+    manifest_file: str,
+    output: str = typer.Option(None, "--output", "-o", help="Write here instead of the manifest's file path"),
+    reflink: bool = typer.Option(
+        False, "--reflink", help="Clone extents from an uncompressed block cache so checkouts share disk space"
+    ),
+):
     """Restore a file from its manifest file."""
     if not manifest_file.endswith(".shard.json"):
         typer.echo("Error: Input must be a .shard.json manifest file.")
@@ -21,9 +27,22 @@ def checkout(manifest_file: str):
         manifest = json.load(f)
         
     store = LocalStore()
-    original_path = manifest["file_path"]
+    original_path = output or manifest["file_path"]
     typer.echo(f"Restoring {original_path}...")
-    
+
+    if reflink:
+        from neuroshard.core.reflink import checkout_reflinked, reflink_supported
+        if reflink_supported(store.root_dir):
+            try:
+                counts = checkout_reflinked(manifest, store, original_path)
+            except FileNotFoundError as e:
+                typer.echo(f"Error: {e}")
+                typer.echo("Try running: nshard pull " + manifest_file + " --remote <url>")
+                raise typer.Exit(code=1)
+            typer.echo(f"Done ({counts['cloned']} blocks cloned, {counts['copied']} copied).")
+            return
+        typer.echo("Reflinks are not supported on this filesystem; writing a full copy.")
+
     with open(original_path, "wb") as f:
         for block in manifest["blocks"]:
             try:
@@ -4,6 +4,8 @@ from neuroshard.core.index import Index
 from neuroshard.core.store import LocalStore
 from neuroshard.core.chunker import chunk_file
 from neuroshard.core.manifest import create_manifest
+from neuroshard.core.metadb import MetaDB
+from neuroshard.core.fsutil import atomic_write
 
 app = typer.Typer()
 
@@ -18,28 +20,30 @@ def commit(message: str = typer.Option(..., "-m", "--message", help="Commit mess
         return
 
     store = LocalStore()
+    db = MetaDB()
     
-    for file_path in tracked_files:
-        if not os.path.exists(file_path):
-            typer.echo(f"Warning: Tracked file {file_path} missing, skipping.")
-            continue
+    with store.lock():
+        for file_path in tracked_files:
+            if not os.path.exists(file_path):
+                typer.echo(f"Warning: Tracked file {file_path} missing, skipping.")
+                continue
             
-        typer.echo(f"Chunking {file_path}...")
-        blocks = chunk_file(file_path)
+            typer.echo(f"Chunking {file_path}...")
+            blocks = chunk_file(file_path)
         
-        # Store blocks
-        for block in blocks:
-            store.write_object(block["hash"], block["data"])
+            # Store blocks
+            for block in blocks:
+                store.write_object(block["hash"], block["data"])
             
-        # Create manifest
-        meta = {"message": message}
-        mhash, manifest, manifest_bytes = create_manifest(file_path, blocks, meta)
-        store.write_manifest(mhash, manifest_bytes)
+            # Create manifest
+            meta = {"message": message}
+            mhash, manifest, manifest_bytes = create_manifest(file_path, blocks, meta)
+            store.write_manifest(mhash, manifest_bytes)
+            db.add_manifest(mhash, manifest, blocks)
         
-        # Write full manifest to workspace file (Git-friendly)
-        manifest_path = f"{file_path}.shard.json"
-        with open(manifest_path, "wb") as f:
-            f.write(manifest_bytes)
+            # Write full manifest to workspace file (Git-friendly)
+            manifest_path = f"{file_path}.shard.json"
+            atomic_write(manifest_path, manifest_bytes)
             
-        typer.echo(f"Committed {file_path} -> {mhash}")
-        typer.echo(f"Updated manifest: {manifest_path}")
+            typer.echo(f"Committed {file_path} -> {mhash}")
+            typer.echo(f"Updated manifest: {manifest_path}")
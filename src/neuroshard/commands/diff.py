@@ -3,41 +3,131 @@ import os
 import json
 from neuroshard.core.store import LocalStore
 from neuroshard.core.chunker import chunk_file
+from neuroshard.core.tensordiff import block_changes
 
 app = typer.Typer()
 
+def _load_manifest(ref: str, store: LocalStore):
+    """Load a manifest from a .shard.json file or a (prefix of a) manifest hash in the store."""
+    if os.path.exists(ref):
+        with open(ref, "rb") as f:
+            return json.load(f)
+    if len(ref) >= 4 and os.path.exists(store.manifests_dir):
+        matches = [m for m in os.listdir(store.manifests_dir) if m.startswith(ref)]
+        if len(matches) == 1:
+            return json.loads(store.read_manifest(matches[0]))
+        if len(matches) > 1:
+            typer.echo(f"Manifest prefix {ref} is ambiguous.")
+            raise typer.Exit(code=1)
+    typer.echo(f"Manifest {ref} not found.")
+    raise typer.Exit(code=1)
+
+def _echo_blocks(counts: dict, old_total: int, new_total: int):
+    typer.echo(f"  Old blocks: {old_total}")
+    typer.echo(f"  New blocks: {new_total}")
+    typer.echo(f"  Unchanged:  {counts['unchanged']}")
+    typer.echo(f"  Changed:    {counts['changed']}")
+    typer.echo(f"  Added:      {counts['added']}")
+    typer.echo(f"  Removed:    {counts['removed']}")
+    if new_total > 0:
+        change_pct = ((counts["changed"] + counts["added"]) / new_total) * 100
+        typer.echo(f"  Change:     {change_pct:.1f}%")
+
+def _echo_tensors(report: dict, top: int):
+    summary = report["summary"]
+    typer.echo(f"  Format:     {report['format']}")
+    typer.echo(f"  Regions:    {summary['changed_regions']}/{summary['regions']} changed")
+    if summary["elements"]:
+        typer.echo(f"  Elements:   {summary['changed_elements']}/{summary['elements']} changed "
+                   f"({summary['changed_elements'] / summary['elements']:.2%})")
+    typer.echo(f"  Max |d|:    {summary['max_abs_delta']:.6g}")
+    typer.echo(f"  L2(d):      {summary['l2_delta']:.6g}")
+    typer.echo(f"  Decompressed {summary['blocks_decompressed']} blocks.")
+    for name in report["added"]:
+        typer.echo(f"  + {name}")
+    for name in report["removed"]:
+        typer.echo(f"  - {name}")
+
+    changed = [r for r in report["regions"] if r["status"] != "unchanged"]
+    changed.sort(key=lambda r: r.get("l2_delta", float("inf")), reverse=True)
+    if not changed:
+        return
+    typer.echo("")
+    typer.echo(f"  {'region':<40} {'dtype':>8} {'changed':>8} {'max |d|':>12} {'L2(d)':>12}")
+    for r in changed[:top]:
+        if r["status"] == "reshaped":
+            typer.echo(f"  {r['name']:<40} {r['dtype']:>8} reshaped {r['old_shape']} -> {r['shape']}")
+            continue
+        typer.echo(f"  {r['name']:<40} {r['dtype']:>8} {r['changed_fraction']:>8.2%} "
+                   f"{r['max_abs_delta']:>12.6g} {r['l2_delta']:>12.6g}")
+    if len(changed) > top:
+        typer.echo(f"  ... {len(changed) - top} more")
+
 @app.callback(invoke_without_command=True)
-def diff(path: str):
-    """Show block-level diff for a file."""
-    if not os.path.exists(path):
-        typer.echo(f"File {path} not found.")
+def diff(
+    path: str = typer.Argument(..., help="Tracked file, or the old manifest (.shard.json or hash)"),
+    other: str = typer.Argument(None, help="New manifest (.shard.json or hash) to compare against"),
+    tensors: bool = typer.Option(False, "--tensors", help="Compare values (needs NumPy): per tensor or region"),
+    dtype: str = typer.Option("float32", help="Element type for files that are not safetensors"),
+    top: int = typer.Option(20, help="Show at most this many changed regions"),
+    as_json: bool = typer.Option(False, "--json", help="Output machine-readable JSON"),
+):
+    """Show block-level diff for a file, or a tensor-level diff of two manifests."""
+    store = LocalStore()
+
+    if other is None:
+        if tensors:
+            typer.echo("--tensors compares two committed manifests: nshard diff --tensors OLD NEW")
+            raise typer.Exit(code=1)
+        if not os.path.exists(path):
+            typer.echo(f"File {path} not found.")
+            return
+
+        manifest_path = f"{path}.shard.json"
+        if not os.path.exists(manifest_path):
+            typer.echo(f"No commit found for {path}.")
+            return
+
+        with open(manifest_path, "rb") as f:
+            manifest = json.load(f)
+
+        current_blocks = chunk_file(path)
+        counts = block_changes(manifest["blocks"], current_blocks)
+        if as_json:
+            typer.echo(json.dumps({"blocks": counts}, indent=2))
+            return
+        typer.echo(f"Diff for {path}:")
+        _echo_blocks(counts, len(manifest["blocks"]), len(current_blocks))
+        return
+
+    old = _load_manifest(path, store)
+    new = _load_manifest(other, store)
+
+    if not tensors:
+        counts = block_changes(old["blocks"], new["blocks"])
+        if as_json:
+            typer.echo(json.dumps({"blocks": counts}, indent=2))
+            return
+        typer.echo(f"Diff {old['file_path']} -> {new['file_path']}:")
+        _echo_blocks(counts, len(old["blocks"]), len(new["blocks"]))
         return
-        
-    manifest_path = f"{path}.shard.json"
-    if not os.path.exists(manifest_path):
-        typer.echo(f"No commit found for {path}.")
+
+    from neuroshard.core.tensordiff import diff_manifests, ITEMSIZES
+    if dtype not in ITEMSIZES:
+        typer.echo(f"Unknown dtype {dtype}; choose from {', '.join(ITEMSIZES)}.")
+        raise typer.Exit(code=1)
+    try:
+        report = diff_manifests(old, new, store, dtype=dtype)
+    except FileNotFoundError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(code=1)
+    except RuntimeError as e:
+        typer.echo(str(e))
+        raise typer.Exit(code=1)
+
+    if as_json:
+        typer.echo(json.dumps(report, indent=2))
         return
-        
-    with open(manifest_path, "rb") as f:
-        manifest = json.load(f)
-    
-    current_blocks = chunk_file(path)
-    old_blocks = manifest["blocks"]
-    
-    old_hashes = {b["hash"] for b in old_blocks}
-    new_hashes = {b["hash"] for b in current_blocks}
-    
-    common = old_hashes.intersection(new_hashes)
-    added = new_hashes - old_hashes
-    removed = old_hashes - new_hashes
-    
-    typer.echo(f"Diff for {path}:")
-    typer.echo(f"  Old blocks: {len(old_blocks)}")
-    typer.echo(f"  New blocks: {len(current_blocks)}")
-    typer.echo(f"  Unchanged:  {len(common)}")
-    typer.echo(f"  Added:      {len(added)}")
-    typer.echo(f"  Removed:    {len(removed)}")
-    
-    if len(current_blocks) > 0:
-        change_pct = (len(added) / len(current_blocks)) * 100
-        typer.echo(f"  Change:     {change_pct:.1f}%")
+    typer.echo(f"Diff {old['file_path']} -> {new['file_path']}:")
+    _echo_blocks(report["blocks"], len(old["blocks"]), len(new["blocks"]))
+    _echo_tensors(report, top)
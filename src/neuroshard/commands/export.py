@@ -0,0 +1,60 @@
+import typer
+import os
+import sys
+import json
+import hashlib
+from typing import List
+from neuroshard.core.index import Index
+from neuroshard.core.store import LocalStore
+from neuroshard.core.archive import write_archive, manifest_blocks
+
+app = typer.Typer()
+
+@app.callback(invoke_without_command=True)
+def export(
+    output: str = typer.Argument(..., help="Archive file to write ('-' for stdout)"),
+    manifest_files: List[str] = typer.Argument(None, help="Manifests to export (default: all tracked files)"),
+    have: str = typer.Option(None, help="File listing block hashes the destination already has"),
+    base: List[str] = typer.Option(None, help="Manifest whose blocks the destination already has"),
+):
+    """Export manifests and their blocks to a single archive for offline transfer."""
+    if not manifest_files:
+        manifest_files = [f"{path}.shard.json" for path in sorted(Index().load())]
+
+    manifests = {}
+    for manifest_file in manifest_files:
+        if not os.path.exists(manifest_file):
+            typer.echo(f"Skipping {manifest_file} (not found, commit first)", err=True)
+            continue
+        with open(manifest_file, "rb") as f:
+            data = f.read()
+        manifests[hashlib.sha256(data).hexdigest()] = data
+
+    if not manifests:
+        typer.echo("Nothing to export.", err=True)
+        raise typer.Exit(code=1)
+
+    exclude = set()
+    if have:
+        with open(have, "r") as f:
+            exclude.update(line.strip() for line in f if line.strip())
+    for base_file in base or []:
+        with open(base_file, "rb") as f:
+            exclude.update(manifest_blocks(f.read()))
+
+    store = LocalStore()
+    try:
+        if output == "-":
+            result = write_archive(sys.stdout.buffer, store, manifests, exclude)
+        else:
+            with open(output, "wb") as f:
+                result = write_archive(f, store, manifests, exclude)
+    except FileNotFoundError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+
+    typer.echo(
+        f"Exported {result['manifests']} manifest(s) and {result['blocks']} block(s) "
+        f"({result['bytes']} bytes) to {output}",
+        err=output == "-",
+    )
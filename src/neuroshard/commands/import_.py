@@ -0,0 +1,53 @@
+import typer
+import os
+import json
+from neuroshard.core.store import LocalStore
+from neuroshard.core.archive import import_archive
+from neuroshard.core.bundle import BundleError
+from neuroshard.core.metadb import MetaDB
+from neuroshard.core.fsutil import atomic_write, is_temp
+
+app = typer.Typer()
+
+@app.callback(invoke_without_command=True)
+def import_(
+    archive: str = typer.Argument(None, help="Archive file to import ('-' for stdin)"),
+    workers: int = typer.Option(None, help="Number of validation threads (default: CPU count)"),
+    write_have: str = typer.Option(None, help="Write the hashes of all local blocks to this file and exit"),
+):
+    """Import an archive created by `nshard export`."""
+    store = LocalStore()
+
+    if write_have:
+        count = 0
+        with open(write_have, "w") as f:
+            for _, _, files in os.walk(store.objects_dir):
+                for name in files:
+                    if is_temp(name):
+                        continue
+                    f.write(name + "\n")
+                    count += 1
+        typer.echo(f"Wrote {count} block hashes to {write_have}")
+        return
+
+    if archive is None:
+        typer.echo("Error: Missing archive path.")
+        raise typer.Exit(code=1)
+
+    with store.lock():
+        try:
+            result = import_archive(archive, store, workers=workers)
+        except (BundleError, FileNotFoundError) as e:
+            typer.echo(f"Error: {e}")
+            raise typer.Exit(code=1)
+
+        # Write workspace manifests so the files can be checked out.
+        db = MetaDB()
+        for mhash, data in result["manifests"].items():
+            manifest = json.loads(data)
+            db.add_manifest(mhash, manifest)
+            manifest_path = f"{manifest['file_path']}.shard.json"
+            atomic_write(manifest_path, data)
+            typer.echo(f"Updated manifest: {manifest_path}")
+
+    typer.echo(f"Imported {len(result['manifests'])} manifest(s) and {result['blocks']} new block(s).")
@@ -0,0 +1,46 @@
+import typer
+import os
+import json
+from neuroshard.core.metadb import MetaDB
+
+app = typer.Typer()
+
+@app.callback(invoke_without_command=True)
+def log(
+    path: str = typer.Argument(None, help="Only show manifests for this file"),
+    block: str = typer.Option(None, help="Only show manifests containing this block hash"),
+    limit: int = typer.Option(None, "-n", "--limit", help="Show at most this many manifests"),
+    as_json: bool = typer.Option(False, "--json", help="Output machine-readable JSON"),
+):
+    """Show committed manifests, newest first."""
+    db = MetaDB()
+    if not os.path.exists(db.root_dir):
+        # Nothing committed here; don't create a repository just to say so.
+        typer.echo("[]" if as_json else "No manifests found.")
+        return
+    db.sync()
+
+    if block:
+        rows = db.manifests_with_block(block)
+        if path is not None:
+            rows = [r for r in rows if r["file_path"] == path]
+        rows = rows[:limit] if limit is not None else rows
+    else:
+        rows = db.history(path, limit)
+
+    if as_json:
+        typer.echo(json.dumps(rows, indent=2))
+        return
+
+    if not rows:
+        typer.echo("No manifests found.")
+        return
+
+    for r in rows:
+        typer.echo(f"manifest {r['hash']}")
+        typer.echo(f"File:    {r['file_path']}")
+        typer.echo(f"Date:    {r['created_at']}")
+        typer.echo(f"Blocks:  {r['blocks']} ({r['logical_bytes']} bytes)")
+        typer.echo("")
+        typer.echo(f"    {r['message'] or ''}")
+        typer.echo("")
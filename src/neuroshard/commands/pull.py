@@ -1,30 +1,99 @@
 import typer
 import json
+import hashlib
+from typing import List
 from neuroshard.core.store import LocalStore
 from neuroshard.core.remote import RemoteClient
+from neuroshard.core.chunker import sha256_bytes
+from neuroshard.core.bundle import BUNDLE_THRESHOLD, batch_by_size
+from neuroshard.core.metadb import MetaDB
+from neuroshard.core import profile
 
 app = typer.Typer()
 
 @app.callback(invoke_without_command=True)
-def pull(manifest_file: str, remote: str = typer.Option(..., help="Remote server URL")):
+def pull(
+    manifest_file: str,
+    remote: str = typer.Option(..., help="Remote server URL"),
+    checkout: bool = typer.Option(False, "--checkout", help="Restore the file while blocks stream in"),
+    priority: List[str] = typer.Option(
+        None, help="With --checkout: fetch first, e.g. 'header', '0:64M' or a tensor glob (repeatable)"
+    ),
+    workers: int = typer.Option(4, help="With --checkout: concurrent downloads"),
+    peer: List[str] = typer.Option(None, help="Peer block server to fetch from before the remote (repeatable)"),
+):
     """Pull missing blocks for a manifest."""
     if not manifest_file.endswith(".shard.json"):
         typer.echo("Error: Input must be a .shard.json manifest file.")
         raise typer.Exit(code=1)
         
     with open(manifest_file, "rb") as f:
-        manifest = json.load(f)
+        manifest_bytes = f.read()
+        manifest = json.loads(manifest_bytes)
+    mhash = hashlib.sha256(manifest_bytes).hexdigest()
     
-    client = RemoteClient(remote)
+    client = RemoteClient(remote, peers=peer)
     store = LocalStore()
     store.init() 
     
-    # Download blocks
+    with store.lock():
+        if checkout:
+            _pull_checkout(manifest, client, store, priority or [], workers)
+        else:
+            _pull_blocks(manifest, client, store)
+        _record_manifest(store, mhash, manifest, manifest_bytes)
+    if not checkout:
+        typer.echo("All blocks present.")
+
+def _pull_blocks(manifest: dict, client: RemoteClient, store: LocalStore):
     typer.echo(f"Fetching blocks for {manifest['file_path']}...")
-    for block in manifest["blocks"]:
-        h = block["hash"]
-        if not store.has_object(h):
-            data = client.download_block(h)
-            store.write_object(h, data)
-            
-    typer.echo("All blocks present.")
+    sizes = {b["hash"]: b["size"] for b in manifest["blocks"]}
+    # Blocks already in the store (e.g. from an interrupted pull) are skipped.
+    needed = [h for h in sizes if not store.has_object(h)]
+
+    def save(h: str, data: bytes):
+        if sha256_bytes(data) != h:
+            typer.echo(f"Error: Block {h} failed verification.")
+            raise typer.Exit(code=1)
+        store.write_object(h, data)
+
+    if len(needed) >= BUNDLE_THRESHOLD:
+        # Many blocks: fetch them in streamed bundles instead of one GET each.
+        # Uncompressed sizes bound the (compressed) bundle size.
+        batches = list(batch_by_size(needed, sizes.get))
+        for i, batch in enumerate(batches):
+            profile.gauge("pull.pending_batches", len(batches) - i)
+            received = set()
+            for h, data in client.download_bundle(batch):
+                save(h, data)
+                received.add(h)
+            for h in batch:
+                if h not in received:
+                    typer.echo(f"Error: Block {h} not found on remote.")
+                    raise typer.Exit(code=1)
+    else:
+        for h in needed:
+            save(h, client.download_block(h))
+
+def _record_manifest(store: LocalStore, mhash: str, manifest: dict, manifest_bytes: bytes):
+    # Record the manifest locally so gc keeps its blocks and log can find it.
+    store.write_manifest(mhash, manifest_bytes)
+    MetaDB().add_manifest(mhash, manifest)
+
+def _pull_checkout(manifest: dict, client: RemoteClient, store: LocalStore, priority: List[str], workers: int):
+    from neuroshard.core.restore import StreamingCheckout
+
+    original_path = manifest["file_path"]
+    typer.echo(f"Streaming {original_path}...")
+    try:
+        stats = StreamingCheckout(manifest, store, client, workers=workers).run(original_path, priority)
+    except (FileNotFoundError, ValueError) as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(code=1)
+
+    if priority:
+        typer.echo(f"Priority regions ready after {stats['priority_ready']:.2f}s.")
+    typer.echo(
+        f"Restored {original_path} in {stats['elapsed']:.2f}s "
+        f"({stats['downloaded']}/{stats['blocks']} blocks downloaded)."
+    )
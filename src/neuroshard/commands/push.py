@@ -5,6 +5,9 @@ import hashlib
 from neuroshard.core.index import Index
 from neuroshard.core.store import LocalStore
 from neuroshard.core.remote import RemoteClient
+from neuroshard.core.journal import TransferJournal
+from neuroshard.core.bundle import BUNDLE_THRESHOLD, batch_by_size
+from neuroshard.core import profile
 
 app = typer.Typer()
 
@@ -34,18 +37,50 @@ def push(remote: str = typer.Option(..., help="Remote server URL")):
         mhash = hashlib.sha256(manifest_bytes).hexdigest()
             
         typer.echo(f"Pushing {file_path}...")
-        
+
+        # Blocks confirmed on the remote by an interrupted push are skipped.
+        journal = TransferJournal("push", client.base_url, mhash)
+        done = journal.load()
+        if done:
+            typer.echo(f"Resuming: {len(done)} blocks already pushed.")
+
+        # Ask the remote which blocks it lacks in a single round trip.
+        pending = list(dict.fromkeys(b["hash"] for b in manifest["blocks"] if b["hash"] not in done))
+        missing = client.missing_blocks(pending) if pending else []
+        missing_set = set(missing)
+
         # Upload blocks
-        for block in manifest["blocks"]:
-            h = block["hash"]
-            if not client.has_block(h):
-                try:
-                    data = store.read_object(h)
-                    client.upload_block(h, data)
-                except FileNotFoundError:
-                     typer.echo(f"Error: Block {h} missing locally, cannot push.")
-                     continue
-        
+        complete = True
+        try:
+            for h in pending:
+                if h not in missing_set:
+                    journal.record(h)
+
+            available = []
+            for h in missing:
+                if store.has_object(h):
+                    available.append(h)
+                else:
+                    typer.echo(f"Error: Block {h} missing locally, cannot push.")
+                    complete = False
+
+            if len(available) >= BUNDLE_THRESHOLD:
+                # Many blocks: stream them in bundles instead of one PUT each.
+                batches = list(batch_by_size(available, store.object_size))
+                for i, batch in enumerate(batches):
+                    profile.gauge("push.pending_batches", len(batches) - i)
+                    client.upload_bundle(lambda batch=batch: ((h, store.read_object(h)) for h in batch))
+                    for h in batch:
+                        journal.record(h)
+            else:
+                for h in available:
+                    client.upload_block(h, store.read_object(h))
+                    journal.record(h)
+        finally:
+            journal.close()
+
         # Upload manifest
         client.upload_manifest(mhash, manifest_bytes)
+        if complete:
+            journal.complete()
         typer.echo(f"Pushed {file_path} -> {mhash}")
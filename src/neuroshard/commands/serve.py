@@ -0,0 +1,19 @@
+import typer
+
+app = typer.Typer()
+
+@app.callback(invoke_without_command=True)
+def serve(
+    store_dir: str = typer.Option("server_storage", "--store", help="Store to serve (e.g. .shard to share with peers)"),
+    host: str = typer.Option("0.0.0.0", help="Interface to bind"),
+    port: int = typer.Option(8000, help="Port to listen on"),
+    read_only: bool = typer.Option(False, "--read-only", help="Serve blocks and manifests but reject uploads"),
+):
+    """Run a block server (read-only mode shares a local store with peers)."""
+    import uvicorn
+    from neuroshard.server import app as server
+
+    server.configure(storage_dir=store_dir, read_only=read_only)
+    mode = "read-only " if read_only else ""
+    typer.echo(f"Serving {store_dir} {mode}on http://{host}:{port}")
+    uvicorn.run(server.app, host=host, port=port, log_level="warning")
@@ -0,0 +1,42 @@
+import typer
+import os
+import json
+from neuroshard.core.metadb import MetaDB
+
+app = typer.Typer()
+
+@app.callback(invoke_without_command=True)
+def stats(
+    as_json: bool = typer.Option(False, "--json", help="Output machine-readable JSON"),
+    top: int = typer.Option(10, help="Number of most expensive manifests to list"),
+):
+    """Show deduplication and storage statistics."""
+    db = MetaDB()
+    if not os.path.exists(db.root_dir):
+        typer.echo("No repository found. Run `nshard init` first.")
+        raise typer.Exit(code=1)
+    db.sync()
+    result = db.stats()
+
+    if as_json:
+        typer.echo(json.dumps(result, indent=2))
+        return
+
+    typer.echo("Storage statistics:")
+    typer.echo(f"  Manifests:         {result['manifests']}")
+    typer.echo(f"  Unique blocks:     {result['blocks']} ({result['shared_blocks']} shared)")
+    typer.echo(f"  Logical bytes:     {result['logical_bytes']}")
+    typer.echo(f"  Unique bytes:      {result['unique_bytes']}")
+    typer.echo(f"  Physical bytes:    {result['physical_bytes']}")
+    typer.echo(f"  Dedup ratio:       {result['dedup_ratio']:.2f}x")
+    typer.echo(f"  Compression ratio: {result['compression_ratio']:.2f}x")
+    typer.echo(f"  Total ratio:       {result['total_ratio']:.2f}x")
+
+    if result["per_manifest"] and top > 0:
+        typer.echo("")
+        typer.echo("Most expensive manifests (exclusive bytes on disk):")
+        for m in result["per_manifest"][:top]:
+            typer.echo(
+                f"  {m['hash'][:12]}  {m['exclusive_physical_bytes']:>12}  "
+                f"{m['file_path']}  {m['created_at'] or ''}  {m['message'] or ''}"
+            )
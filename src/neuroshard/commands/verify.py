@@ -0,0 +1,40 @@
+import typer
+from neuroshard.core.store import LocalStore
+from neuroshard.core.verify import verify_store
+
+app = typer.Typer()
+
+@app.callback(invoke_without_command=True)
+def verify(
+    store_dir: str = typer.Option(".shard", "--store", help="Store to check (e.g. server_storage)"),
+    remote: str = typer.Option(None, help="Remote server URL to re-fetch bad blocks from"),
+    workers: int = typer.Option(None, help="Number of worker threads (default: CPU count)"),
+    max_rate: float = typer.Option(None, help="Limit reads to this many MB/s"),
+    restart: bool = typer.Option(False, help="Ignore progress saved by an interrupted run"),
+):
+    """Verify the integrity of stored blocks."""
+    store = LocalStore(store_dir)
+    client = None
+    if remote:
+        from neuroshard.core.remote import RemoteClient
+        client = RemoteClient(remote)
+    report = verify_store(
+        store,
+        workers=workers,
+        max_rate=max_rate * 1024 * 1024 if max_rate else None,
+        resume=not restart,
+        remote=client,
+    )
+
+    if report["resumed"]:
+        typer.echo(f"Resumed: skipped {report['resumed']} objects verified by a previous run.")
+    typer.echo(f"Checked {report['checked']} objects.")
+    for obj_hash in report["repaired"]:
+        typer.echo(f"  repaired {obj_hash}")
+    for obj_hash, error in sorted(report["problems"].items()):
+        typer.echo(f"  {error}: {obj_hash}")
+
+    if report["problems"]:
+        typer.echo(f"{len(report['problems'])} problem(s) found.")
+        raise typer.Exit(code=1)
+    typer.echo("OK.")
@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Set, BinaryIO
+from neuroshard.core.store import LocalStore
+from neuroshard.core.bundle import iter_encode, iter_decode, iter_buffer_records, BundleError
+from neuroshard.core import profile
+
+# Archive layout: ARCHIVE_MAGIC | 8-byte big-endian header length | JSON header
+# (the manifests) | bundle stream of blocks (see core/bundle.py).
+ARCHIVE_MAGIC = b"NSA1"
+HEADER_LENGTH = struct.Struct(">Q")
+
+def write_archive(out: BinaryIO, store: LocalStore, manifests: Dict[str, bytes], exclude: Set[str]) -> Dict[str, int]:
+    """
+    Write manifests plus every block they reference that is not in `exclude`.
+    Returns counts of manifests and blocks written.
+    """
+    blocks = []
+    seen = set(exclude)
+    for data in manifests.values():
+        for block in json.loads(data)["blocks"]:
+            h = block["hash"]
+            if h not in seen:
+                seen.add(h)
+                blocks.append(h)
+
+    missing = [h for h in blocks if not store.has_object(h)]
+    if missing:
+        raise FileNotFoundError(f"Block {missing[0]} missing locally ({len(missing)} missing).")
+
+    header = json.dumps({
+        "archive_version": 1,
+        "manifests": {mhash: data.decode("utf-8") for mhash, data in manifests.items()},
+    }).encode("utf-8")
+    out.write(ARCHIVE_MAGIC)
+    out.write(HEADER_LENGTH.pack(len(header)))
+    out.write(header)
+
+    written = 0
+    for chunk in iter_encode((h, store.read_object(h)) for h in blocks):
+        out.write(chunk)
+        written += len(chunk)
+
+    return {"manifests": len(manifests), "blocks": len(blocks), "bytes": written}
+
+def _read_header(read) -> Dict[str, Any]:
+    if read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+        raise BundleError("Not a NeuroShard archive.")
+    raw_len = read(HEADER_LENGTH.size)
+    if len(raw_len) != HEADER_LENGTH.size:
+        raise BundleError("Archive is truncated.")
+    (length,) = HEADER_LENGTH.unpack(raw_len)
+    header = read(length)
+    if len(header) != length:
+        raise BundleError("Archive is truncated.")
+    try:
+        header = json.loads(header)
+    except ValueError:
+        raise BundleError("Archive header is corrupt.")
+    if not isinstance(header, dict) or not isinstance(header.get("manifests"), dict):
+        raise BundleError("Archive header is corrupt.")
+    return header
+
+def _parse_manifests(header: Dict[str, Any]) -> Dict[str, bytes]:
+    manifests = {}
+    for mhash, text in header["manifests"].items():
+        if not isinstance(text, str):
+            raise BundleError(f"Manifest {mhash} failed verification.")
+        data = text.encode("utf-8")
+        if hashlib.sha256(data).hexdigest() != mhash:
+            raise BundleError(f"Manifest {mhash} failed verification.")
+        manifests[mhash] = data
+    return manifests
+
+def _missing_blocks(store: LocalStore, manifests: Dict[str, bytes]) -> List[str]:
+    """Blocks referenced by `manifests` that are not in the store."""
+    referenced = {}
+    for mhash, data in manifests.items():
+        try:
+            referenced.update(dict.fromkeys(manifest_blocks(data)))
+        except (ValueError, KeyError, TypeError):
+            raise BundleError(f"Manifest {mhash} is malformed.")
+    return [h for h in referenced if not store.has_object(h)]
+
+def _store_buffer_block(store: LocalStore, buf, obj_hash: str, start: int, end: int) -> bool:
+    # The views are released on the way out, even when verification fails, so
+    # nothing (e.g. a traceback) keeps the mmap pinned once import returns.
+    with memoryview(buf) as view, view[start:end] as data:
+        return _store_block(store, obj_hash, data)
+
+def _store_block(store: LocalStore, obj_hash: str, data) -> bool:
+    """Verify and store one block. Returns False if the block was already present."""
+    with profile.stage("archive.verify", len(data)):
+        if hashlib.sha256(data).hexdigest() != obj_hash:
+            raise BundleError(f"Block {obj_hash} failed verification.")
+    if store.has_object(obj_hash):
+        return False
+    store.write_object(obj_hash, data)
+    return True
+
+def import_archive(path: str, store: LocalStore, workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Import an archive written by write_archive into `store`.
+    Regular files are mmap'ed and their blocks verified in parallel;
+    "-" reads a stream from stdin. Manifests are only stored once every
+    block has been verified and every block they reference is in the store
+    (from the archive or already local). Returns the manifests and counts.
+    """
+    store.init()
+    if path == "-":
+        f = sys.stdin.buffer
+        header = _read_header(f.read)
+        manifests = _parse_manifests(header)
+        stored = sum(_store_block(store, h, data) for h, data in iter_decode(f))
+    else:
+        if os.path.getsize(path) == 0:
+            raise BundleError("Archive is empty.")
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            pos = 0
+
+            def read(n):
+                nonlocal pos
+                chunk = buf[pos:pos + n]
+                pos += n
+                return chunk
+
+            header = _read_header(read)
+            manifests = _parse_manifests(header)
+            records = iter_buffer_records(buf, pos)
+            with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                stored = sum(pool.map(lambda r: _store_buffer_block(store, buf, *r), records))
+
+    missing = _missing_blocks(store, manifests)
+    if missing:
+        raise FileNotFoundError(f"Block {missing[0]} is in neither the archive nor the local store "
+                                f"({len(missing)} missing); it was exported with a stale --have or --base.")
+
+    for mhash, data in manifests.items():
+        store.write_manifest(mhash, data)
+
+    return {"manifests": manifests, "blocks": stored}
+
+def manifest_blocks(data: bytes) -> Iterable[str]:
+    """Block hashes referenced by serialized manifest bytes."""
+    return (b["hash"] for b in json.loads(data)["blocks"])
@@ -0,0 +1,116 @@
+import struct
+from typing import Callable, Iterable, Iterator, List, Tuple, BinaryIO
+
+# Bundle framing: MAGIC, then one record per block:
+#   32-byte raw SHA-256 | 8-byte big-endian length | compressed block bytes
+MAGIC = b"NSB1"
+RECORD_HEADER = struct.Struct(">32sQ")
+MAX_RECORD_SIZE = 1024 * 1024 * 1024  # Sanity limit against corrupt headers
+
+# push/pull switch from per-block requests to bundles at this many missing blocks
+BUNDLE_THRESHOLD = 16
+BUNDLE_MAX_BYTES = 256 * 1024 * 1024  # Per request, bounds the cost of a retry
+
+class BundleError(ValueError):
+    """Raised when a bundle stream is malformed or truncated."""
+
+def encode_header(obj_hash: str, length: int) -> bytes:
+    """Frame header for one record."""
+    return RECORD_HEADER.pack(bytes.fromhex(obj_hash), length)
+
+def iter_encode(records: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """Encode (hash, data) records as a stream of byte chunks."""
+    yield MAGIC
+    for obj_hash, data in records:
+        yield encode_header(obj_hash, len(data))
+        yield data
+
+def batch_by_size(hashes: List[str], size_of: Callable[[str], int], max_bytes: int = BUNDLE_MAX_BYTES) -> Iterator[List[str]]:
+    """Split hashes into consecutive batches of at most `max_bytes` (at least one block each)."""
+    batch, total = [], 0
+    for obj_hash in hashes:
+        size = size_of(obj_hash)
+        if batch and total + size > max_bytes:
+            yield batch
+            batch, total = [], 0
+        batch.append(obj_hash)
+        total += size
+    if batch:
+        yield batch
+
+class BundleDecoder:
+    """
+    Incremental bundle parser: feed it bytes as they arrive and it returns
+    every (hash, data) record completed so far.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._seen_magic = False
+        self._header = None  # (hash, length) of the record being read
+
+    def feed(self, chunk: bytes) -> List[Tuple[str, bytes]]:
+        self._buf += chunk
+        records = []
+
+        if not self._seen_magic:
+            if len(self._buf) < len(MAGIC):
+                return records
+            if bytes(self._buf[:len(MAGIC)]) != MAGIC:
+                raise BundleError("Not a NeuroShard bundle.")
+            del self._buf[:len(MAGIC)]
+            self._seen_magic = True
+
+        while True:
+            if self._header is None:
+                if len(self._buf) < RECORD_HEADER.size:
+                    break
+                digest, length = RECORD_HEADER.unpack_from(self._buf)
+                if length > MAX_RECORD_SIZE:
+                    raise BundleError(f"Record length {length} exceeds limit.")
+                del self._buf[:RECORD_HEADER.size]
+                self._header = (digest.hex(), length)
+
+            obj_hash, length = self._header
+            if len(self._buf) < length:
+                break
+            records.append((obj_hash, bytes(self._buf[:length])))
+            del self._buf[:length]
+            self._header = None
+
+        return records
+
+    def close(self):
+        """Check that the stream ended on a record boundary."""
+        if not self._seen_magic or self._header is not None or self._buf:
+            raise BundleError("Bundle is truncated.")
+
+def iter_buffer_records(buf, offset: int = 0) -> Iterator[Tuple[str, int, int]]:
+    """
+    Locate records in an in-memory buffer (e.g. an mmap) without copying:
+    yields (hash, start, end) of each record's data within `buf`. Callers
+    slice the data themselves, so no views into `buf` outlive them.
+    """
+    if bytes(buf[offset:offset + len(MAGIC)]) != MAGIC:
+        raise BundleError("Not a NeuroShard bundle.")
+    pos = offset + len(MAGIC)
+    end = len(buf)
+    while pos < end:
+        if end - pos < RECORD_HEADER.size:
+            raise BundleError("Bundle is truncated.")
+        digest, length = RECORD_HEADER.unpack_from(buf, pos)
+        pos += RECORD_HEADER.size
+        if end - pos < length:
+            raise BundleError("Bundle is truncated.")
+        yield digest.hex(), pos, pos + length
+        pos += length
+
+def iter_decode(f: BinaryIO, chunk_size: int = 1024 * 1024) -> Iterator[Tuple[str, bytes]]:
+    """Read (hash, data) records from a file-like object."""
+    decoder = BundleDecoder()
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        yield from decoder.feed(chunk)
+    decoder.close()
@@ -1,6 +1,7 @@
 import hashlib
 import zstandard as zstd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+from neuroshard.core import profile
 
 CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
 
@@ -10,13 +11,45 @@ def sha256_bytes(b: bytes) -> str:
 
 def compress_chunk(chunk: bytes) -> bytes:
     """Compress a chunk using Zstd."""
-    cctx = zstd.ZstdCompressor(level=3)
-    return cctx.compress(chunk)
+    with profile.stage("chunker.compress", len(chunk)):
+        cctx = zstd.ZstdCompressor(level=3)
+        return cctx.compress(chunk)
 
 def decompress_chunk(compressed_chunk: bytes) -> bytes:
     """Decompress a chunk using Zstd."""
-    dctx = zstd.ZstdDecompressor()
-    return dctx.decompress(compressed_chunk)
+    with profile.stage("chunker.decompress", len(compressed_chunk)):
+        dctx = zstd.ZstdDecompressor()
+        return dctx.decompress(compressed_chunk)
+
+def make_block(chunk) -> Dict[str, Any]:
+    """Compress and hash one chunk (bytes or memoryview) into block metadata plus data."""
+    compressed = compress_chunk(chunk)
+    with profile.stage("chunker.hash", len(compressed)):
+        h = sha256_bytes(compressed).lower()
+
+    return {
+        "hash": h,
+        "size": len(chunk),
+        "compressed_size": len(compressed),
+        "data": compressed  # We return data here so the caller can store it
+    }
+
+def iter_file_chunks(file_path: str) -> Iterator[bytes]:
+    """Yield the raw CHUNK_SIZE pieces of a file."""
+    with open(file_path, "rb") as f:
+        while True:
+            with profile.stage("chunker.read") as span:
+                chunk = f.read(CHUNK_SIZE)
+                span.nbytes = len(chunk)
+            if not chunk:
+                break
+            yield chunk
+
+def iter_buffer_chunks(buf) -> Iterator[memoryview]:
+    """Yield CHUNK_SIZE pieces of an in-memory buffer without copying."""
+    view = memoryview(buf).cast("B")
+    for offset in range(0, len(view), CHUNK_SIZE):
+        yield view[offset:offset + CHUNK_SIZE]
 
 def chunk_file(file_path: str) -> List[Dict[str, Any]]:
     """
@@ -24,20 +57,4 @@ def chunk_file(file_path: str) -> List[Dict[str, Any]]:
     Returns a list of block metadata (hash, size, compressed_size).
     Does NOT store the chunks; that's the job of the Store.
     """
-    blocks = []
-    with open(file_path, "rb") as f:
-        while True:
-            chunk = f.read(CHUNK_SIZE)
-            if not chunk:
-                break
-            
-            compressed = compress_chunk(chunk)
-            h = sha256_bytes(compressed).lower()
-            
-            blocks.append({
-                "hash": h,
-                "size": len(chunk),
-                "compressed_size": len(compressed),
-                "data": compressed  # We return data here so the caller can store it
-            })
-    return blocks
+    return [make_block(chunk) for chunk in iter_file_chunks(file_path)]
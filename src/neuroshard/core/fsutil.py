@@ -0,0 +1,117 @@
+import os
+import time
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks below are no-ops
+    fcntl = None
+
+# Prefix of in-progress writes. Directory scans (gc, verify, metrics) skip these.
+TEMP_PREFIX = ".tmp-"
+
+def is_temp(name: str) -> bool:
+    return name.startswith(TEMP_PREFIX)
+
+def _umask() -> int:
+    # Linux exposes the umask without changing it; elsewhere it can only be
+    # read by setting it, which briefly affects other threads.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+def atomic_write(path: str, data: bytes):
+    """
+    Write `path` via a temp file in the same directory and a rename, so
+    readers (and other processes) see either the old file or the complete
+    new one, never a partial write. The data is fsynced before the rename,
+    and the file gets the existing target's mode, or 0666 less the umask
+    like a plain open() would.
+    """
+    directory = os.path.dirname(path) or "."
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_umask()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if hasattr(os, "fchmod"):
+                os.fchmod(f.fileno(), mode)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def remove_stale_temp_files(directory: str, max_age: float = 3600.0) -> int:
+    """Delete temp files left behind by crashed writers. Returns the bytes removed."""
+    freed = 0
+    cutoff = time.time() - max_age
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not is_temp(name):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+                if st.st_mtime < cutoff:
+                    os.remove(path)
+                    freed += st.st_size
+            except OSError:
+                pass
+    return freed
+
+class FileLock:
+    """
+    Advisory inter-process lock (flock) on `path`. Shared holders may run
+    together; an exclusive holder waits for all of them and blocks new ones.
+    Nested acquires of the same object are counted rather than re-locked.
+    """
+
+    def __init__(self, path: str, shared: bool = False):
+        self.path = path
+        self.shared = shared
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self):
+        if self._depth == 0:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                try:
+                    fcntl.flock(self._fd, fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(self._fd)
+                    self._fd = None
+                    raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
@@ -1,40 +1,42 @@
 import os
-import json
-from typing import Set
+from typing import Set, Tuple
 from neuroshard.core.store import LocalStore
+from neuroshard.core.metadb import MetaDB
+from neuroshard.core.fsutil import is_temp, remove_stale_temp_files
 
-def collect_garbage(dry_run: bool = False) -> int:
+def collect_garbage(dry_run: bool = False) -> Tuple[int, int]:
     """
     Remove objects not referenced by any manifest.
-    Returns number of bytes freed.
+    Returns (bytes freed, number of objects removed).
+    Holds the store lock exclusively, so it waits for (and blocks) commits,
+    pulls and imports that have written objects but not yet their manifests.
     """
     store = LocalStore()
     
-    # 1. Collect all referenced hashes
-    referenced_hashes: Set[str] = set()
-    
     if not os.path.exists(store.manifests_dir):
-        return 0
-        
-    for manifest_name in os.listdir(store.manifests_dir):
-        try:
-            data = store.read_manifest(manifest_name)
-            manifest = json.loads(data)
-            for block in manifest["blocks"]:
-                referenced_hashes.add(block["hash"])
-        except Exception:
-            continue
+        return 0, 0
+
+    with store.lock(shared=False):
+        return _collect(store, dry_run)
+
+def _collect(store: LocalStore, dry_run: bool) -> Tuple[int, int]:
+    # 1. Collect all referenced hashes from the metadata index
+    db = MetaDB(store.root_dir)
+    db.sync()
+    referenced_hashes: Set[str] = db.referenced_blocks()
             
     # 2. Scan all objects
     freed_bytes = 0
     removed_count = 0
     
     if not os.path.exists(store.objects_dir):
-        return 0
+        return 0, 0
 
     for root, _, files in os.walk(store.objects_dir):
         for filename in files:
             obj_hash = filename
+            if is_temp(filename):
+                continue
             if obj_hash not in referenced_hashes:
                 path = os.path.join(root, filename)
                 size = os.path.getsize(path)
@@ -47,5 +49,23 @@ def collect_garbage(dry_run: bool = False) -> int:
                         pass
                 freed_bytes += size
                 removed_count += 1
+
+    # 3. Drop uncompressed copies kept for reflinked checkouts
+    from neuroshard.core.reflink import BlockCache
+    cache = BlockCache(store)
+    for obj_hash in list(cache.hashes()):
+        if obj_hash not in referenced_hashes:
+            if dry_run:
+                freed_bytes += os.path.getsize(cache.path(obj_hash))
+            else:
+                freed_bytes += cache.remove(obj_hash)
+
+    # 4. Drop index rows for blocks no manifest references any more, and
+    # temp files left by writers that crashed mid-write
+    if not dry_run:
+        db.prune_blocks()
+        freed_bytes += remove_stale_temp_files(store.objects_dir)
+        freed_bytes += remove_stale_temp_files(store.manifests_dir)
+        freed_bytes += remove_stale_temp_files(cache.cache_dir)
                 
     return freed_bytes, removed_count
@@ -1,6 +1,7 @@
 import os
 import json
 from typing import Set
+from neuroshard.core.fsutil import FileLock, atomic_write
 
 class Index:
     def __init__(self, root_dir: str = ".shard"):
@@ -15,18 +16,23 @@ class Index:
 
     def save(self, tracked: Set[str]):
         """Save the set of tracked files."""
-        with open(self.index_path, "w") as f:
-            json.dump(list(tracked), f, indent=2)
+        atomic_write(self.index_path, json.dumps(list(tracked), indent=2).encode("utf-8"))
+
+    def lock(self) -> FileLock:
+        """Held around load-modify-save so concurrent updates aren't lost."""
+        return FileLock(self.index_path + ".lock")
 
     def add(self, file_path: str):
         """Add a file to tracking."""
-        tracked = self.load()
-        tracked.add(file_path)
-        self.save(tracked)
+        with self.lock():
+            tracked = self.load()
+            tracked.add(file_path)
+            self.save(tracked)
 
     def remove(self, file_path: str):
         """Remove a file from tracking."""
-        tracked = self.load()
-        if file_path in tracked:
-            tracked.remove(file_path)
-            self.save(tracked)
+        with self.lock():
+            tracked = self.load()
+            if file_path in tracked:
+                tracked.remove(file_path)
+                self.save(tracked)
@@ -0,0 +1,44 @@
+import os
+import hashlib
+from typing import Set
+
+class TransferJournal:
+    """
+    Append-only record of blocks already transferred by a push, so an
+    interrupted run can resume without re-checking the remote for every block.
+    (A pull needs none: the local store already shows what has arrived.)
+    One journal per (operation, remote, manifest); removed once it completes.
+    """
+
+    def __init__(self, operation: str, remote: str, manifest_hash: str, root_dir: str = ".shard"):
+        key = hashlib.sha256(f"{remote}\n{manifest_hash}".encode("utf-8")).hexdigest()[:16]
+        self.journal_dir = os.path.join(root_dir, "journal")
+        self.path = os.path.join(self.journal_dir, f"{operation}-{key}")
+        self._file = None
+
+    def load(self) -> Set[str]:
+        """Return the hashes recorded as done by previous runs."""
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, "r") as f:
+            # A torn last line from a crash is simply ignored.
+            return {line.strip() for line in f if len(line.strip()) == 64}
+
+    def record(self, obj_hash: str):
+        """Mark a block as transferred."""
+        if self._file is None:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write(obj_hash + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def complete(self):
+        """The transfer finished; forget it."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
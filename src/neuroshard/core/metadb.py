@@ -0,0 +1,244 @@
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Set
+from neuroshard.core.fsutil import is_temp
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifests (
+    hash TEXT PRIMARY KEY,
+    file_path TEXT,
+    message TEXT,
+    created_at TEXT,
+    blocks INTEGER NOT NULL,
+    logical_bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS manifests_by_path ON manifests (file_path, created_at);
+CREATE INDEX IF NOT EXISTS manifests_by_time ON manifests (created_at);
+
+CREATE TABLE IF NOT EXISTS blocks (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    compressed_size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS manifest_blocks (
+    manifest_hash TEXT NOT NULL,
+    block_hash TEXT NOT NULL,
+    PRIMARY KEY (manifest_hash, block_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS manifest_blocks_by_block ON manifest_blocks (block_hash);
+"""
+
+class MetaDB:
+    """
+    Local SQLite index of manifests and the blocks they reference.
+
+    Kept up to date by commit, pull, import and gc so that log, stats and gc
+    can answer queries without parsing every manifest in the store.
+    `refcount` is the number of distinct manifests referencing a block.
+    """
+
+    def __init__(self, root_dir: str = ".shard"):
+        self.root_dir = root_dir
+        self.db_path = os.path.join(root_dir, "metadata.db")
+        self.manifests_dir = os.path.join(root_dir, "manifests")
+        self.objects_dir = os.path.join(root_dir, "objects")
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.root_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @contextmanager
+    def _write(self):
+        """
+        Write transaction that takes SQLite's write lock up front, so the
+        read-then-write logic in _add/_remove is atomic across processes.
+        """
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            yield
+
+    def add_manifest(self, manifest_hash: str, manifest: Dict[str, Any], blocks: List[Dict[str, Any]] = None):
+        """Index a manifest. `blocks` may carry chunker output with compressed sizes."""
+        with self._write():
+            self._add(manifest_hash, manifest, blocks)
+
+    def remove_manifest(self, manifest_hash: str):
+        with self._write():
+            self._remove(manifest_hash)
+
+    def sync(self):
+        """
+        Bring the index up to date with the manifests on disk, e.g. after an
+        upgrade or manual edits. Only manifests not yet indexed are parsed.
+        """
+        with self._write():
+            # Listed inside the transaction: writers store a manifest before
+            # indexing it, so nothing indexed can be missing from this listing.
+            on_disk = set(os.listdir(self.manifests_dir)) if os.path.exists(self.manifests_dir) else set()
+            on_disk = {m for m in on_disk if not is_temp(m)}
+            indexed = {row[0] for row in self.conn.execute("SELECT hash FROM manifests")}
+            for mhash in indexed - on_disk:
+                self._remove(mhash)
+            for mhash in on_disk - indexed:
+                try:
+                    with open(os.path.join(self.manifests_dir, mhash), "rb") as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                self._add(mhash, manifest)
+
+    def _add(self, manifest_hash: str, manifest: Dict[str, Any], blocks: List[Dict[str, Any]] = None):
+        if self.conn.execute("SELECT 1 FROM manifests WHERE hash = ?", (manifest_hash,)).fetchone():
+            return
+
+        compressed_sizes = {b["hash"]: b["compressed_size"] for b in blocks or [] if "compressed_size" in b}
+        sizes = {}
+        for block in manifest["blocks"]:
+            sizes[block["hash"]] = block["size"]
+
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO blocks (hash, size, compressed_size) VALUES (?, ?, ?)",
+            [(h, size, compressed_sizes[h] if h in compressed_sizes else self._object_size(h))
+             for h, size in sizes.items()],
+        )
+        self.conn.executemany(
+            "INSERT INTO manifest_blocks (manifest_hash, block_hash) VALUES (?, ?)",
+            [(manifest_hash, h) for h in sizes],
+        )
+        self.conn.executemany(
+            "UPDATE blocks SET refcount = refcount + 1 WHERE hash = ?",
+            [(h,) for h in sizes],
+        )
+
+        meta = manifest.get("meta", {})
+        self.conn.execute(
+            "INSERT INTO manifests (hash, file_path, message, created_at, blocks, logical_bytes) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                manifest_hash,
+                manifest.get("file_path"),
+                meta.get("message"),
+                meta.get("created_at"),
+                len(manifest["blocks"]),
+                sum(b["size"] for b in manifest["blocks"]),
+            ),
+        )
+
+    def _remove(self, manifest_hash: str):
+        self.conn.execute(
+            "UPDATE blocks SET refcount = refcount - 1 WHERE hash IN "
+            "(SELECT block_hash FROM manifest_blocks WHERE manifest_hash = ?)",
+            (manifest_hash,),
+        )
+        self.conn.execute("DELETE FROM manifest_blocks WHERE manifest_hash = ?", (manifest_hash,))
+        self.conn.execute("DELETE FROM manifests WHERE hash = ?", (manifest_hash,))
+
+    def _object_size(self, obj_hash: str) -> int:
+        try:
+            return os.path.getsize(os.path.join(self.objects_dir, obj_hash[:2], obj_hash))
+        except OSError:
+            return 0
+
+    # --- Queries -------------------------------------------------------------
+
+    def referenced_blocks(self) -> Set[str]:
+        """Hashes of all blocks referenced by at least one manifest."""
+        return {row[0] for row in self.conn.execute("SELECT hash FROM blocks WHERE refcount > 0")}
+
+    def prune_blocks(self, hashes: List[str] = None) -> int:
+        """Drop unreferenced block rows (all of them, or just `hashes`)."""
+        with self._write():
+            if hashes is None:
+                cur = self.conn.execute("DELETE FROM blocks WHERE refcount <= 0")
+            else:
+                cur = self.conn.executemany(
+                    "DELETE FROM blocks WHERE hash = ? AND refcount <= 0", [(h,) for h in hashes]
+                )
+            return cur.rowcount
+
+    def manifests_with_block(self, block_hash: str) -> List[Dict[str, Any]]:
+        return self._manifest_rows(
+            "SELECT m.* FROM manifests m JOIN manifest_blocks mb ON mb.manifest_hash = m.hash "
+            "WHERE mb.block_hash = ? ORDER BY m.created_at DESC, m.rowid DESC",
+            (block_hash,),
+        )
+
+    def history(self, file_path: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Manifests, newest first, optionally only those for `file_path`."""
+        sql = "SELECT * FROM manifests"
+        args = []
+        if file_path is not None:
+            sql += " WHERE file_path = ?"
+            args.append(file_path)
+        sql += " ORDER BY created_at DESC, rowid DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return self._manifest_rows(sql, args)
+
+    def latest(self, file_path: str) -> Optional[Dict[str, Any]]:
+        rows = self.history(file_path, limit=1)
+        return rows[0] if rows else None
+
+    def _manifest_rows(self, sql: str, args) -> List[Dict[str, Any]]:
+        cur = self.conn.execute(sql, args)
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, row)) for row in cur]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Storage analytics. logical_bytes is the size of all committed files,
+        unique_bytes the uncompressed size of distinct blocks and
+        physical_bytes their size on disk. A manifest's exclusive bytes are
+        held only by it, i.e. what removing it would free.
+        """
+        c = self.conn
+        manifests, logical_bytes = c.execute(
+            "SELECT COUNT(*), COALESCE(SUM(logical_bytes), 0) FROM manifests"
+        ).fetchone()
+        blocks, shared_blocks, unique_bytes, physical_bytes = c.execute(
+            "SELECT COUNT(*), COALESCE(SUM(refcount > 1), 0), COALESCE(SUM(size), 0), "
+            "COALESCE(SUM(compressed_size), 0) FROM blocks WHERE refcount > 0"
+        ).fetchone()
+
+        per_manifest = self._manifest_rows(
+            "SELECT m.*, COALESCE(x.exclusive_bytes, 0) AS exclusive_bytes, "
+            "COALESCE(x.exclusive_physical_bytes, 0) AS exclusive_physical_bytes "
+            "FROM manifests m LEFT JOIN ("
+            "  SELECT mb.manifest_hash, SUM(b.size) AS exclusive_bytes, "
+            "         SUM(b.compressed_size) AS exclusive_physical_bytes "
+            "  FROM manifest_blocks mb JOIN blocks b ON b.hash = mb.block_hash "
+            "  WHERE b.refcount = 1 GROUP BY mb.manifest_hash"
+            ") x ON x.manifest_hash = m.hash "
+            "ORDER BY exclusive_physical_bytes DESC, m.created_at DESC",
+            (),
+        )
+
+        return {
+            "manifests": manifests,
+            "blocks": blocks,
+            "shared_blocks": shared_blocks,
+            "logical_bytes": logical_bytes,
+            "unique_bytes": unique_bytes,
+            "physical_bytes": physical_bytes,
+            "dedup_ratio": logical_bytes / unique_bytes if unique_bytes else 0.0,
+            "compression_ratio": unique_bytes / physical_bytes if physical_bytes else 0.0,
+            "total_ratio": logical_bytes / physical_bytes if physical_bytes else 0.0,
+            "per_manifest": per_manifest,
+        }
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from typing import Dict, Any, Optional
+
+PROFILE_ENV = "NEUROSHARD_PROFILE"
+PROFILE_OUTPUT_ENV = "NEUROSHARD_PROFILE_OUTPUT"
+
+class Profiler:
+    """
+    Collects per-stage timings, byte counters and gauges (e.g. queue depths).
+    Thread-safe; every stage also produces a Chrome trace event.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages: Dict[str, Dict[str, float]] = {}
+            self.counters: Dict[str, int] = {}
+            self.gauges: Dict[str, Dict[str, float]] = {}
+            self.events = []
+            self.origin = time.perf_counter()
+
+    def record(self, name: str, start: float, seconds: float, nbytes: int = 0):
+        """Record one completed stage that began at perf_counter() `start`."""
+        with self._lock:
+            s = self.stages.get(name)
+            if s is None:
+                s = self.stages[name] = {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0}
+            s["count"] += 1
+            s["seconds"] += seconds
+            s["max_seconds"] = max(s["max_seconds"], seconds)
+            s["bytes"] += nbytes
+            self.events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": seconds * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"bytes": nbytes},
+            })
+
+    def stage(self, name: str, nbytes: int = 0) -> "_Span":
+        return _Span(self, name, nbytes)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            g = self.gauges.get(name)
+            if g is None:
+                g = self.gauges[name] = {"last": value, "max": value}
+            g["last"] = value
+            g["max"] = max(g["max"], value)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+                "gauges": {k: dict(v) for k, v in self.gauges.items()},
+            }
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def format_table(self) -> str:
+        summary = self.summary()
+        lines = [f"{'stage':<28} {'calls':>8} {'total s':>10} {'max ms':>10} {'MB':>10} {'MB/s':>10}"]
+        lines.append("-" * len(lines[0]))
+        for name, s in sorted(summary["stages"].items(), key=lambda kv: kv[1]["seconds"], reverse=True):
+            mb = s["bytes"] / (1024 * 1024)
+            rate = mb / s["seconds"] if s["seconds"] and s["bytes"] else 0.0
+            lines.append(
+                f"{name:<28} {s['count']:>8} {s['seconds']:>10.3f} "
+                f"{s['max_seconds'] * 1000:>10.1f} {mb:>10.1f} {rate:>10.1f}"
+            )
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(f"{name:<28} {value:>8}")
+        for name, g in sorted(summary["gauges"].items()):
+            lines.append(f"{name:<28} last={g['last']} max={g['max']}")
+        return "\n".join(lines)
+
+class _Span:
+    __slots__ = ("profiler", "name", "nbytes", "start")
+
+    def __init__(self, profiler: Profiler, name: str, nbytes: int = 0):
+        self.profiler = profiler
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start, self.nbytes)
+        return False
+
+profiler = Profiler()
+_enabled = False
+
+def is_enabled() -> bool:
+    return _enabled
+
+def enable(output: Optional[str] = None):
+    """
+    Turn on instrumentation and report when the process exits.
+    `output` ending in .trace.json is written as a Chrome trace, any other path
+    as a JSON summary; without it a table is printed to stderr.
+    """
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    profiler.reset()
+    atexit.register(report, output)
+
+def report(output: Optional[str] = None):
+    if not output:
+        sys.stderr.write(profiler.format_table() + "\n")
+        return
+    data = profiler.chrome_trace() if output.endswith(".trace.json") else profiler.summary()
+    with open(output, "w") as f:
+        json.dump(data, f, indent=2)
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+def stage(name: str, nbytes: int = 0):
+    """
+    Time a pipeline stage. A no-op unless profiling is enabled.
+    The byte count can also be set on the span once known (`span.nbytes = n`).
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return profiler.stage(name, nbytes)
+
+def count(name: str, n: int = 1):
+    if _enabled:
+        profiler.count(name, n)
+
+def gauge(name: str, value: float):
+    if _enabled:
+        profiler.gauge(name, value)
+
+if os.environ.get(PROFILE_ENV, "") not in ("", "0"):
+    enable(os.environ.get(PROFILE_OUTPUT_ENV))
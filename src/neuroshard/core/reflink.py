@@ -0,0 +1,128 @@
+import os
+import struct
+import tempfile
+from typing import Any, Dict, Iterator
+from neuroshard.core.store import LocalStore
+from neuroshard.core.chunker import decompress_chunk
+from neuroshard.core.fsutil import atomic_write, is_temp
+from neuroshard.core import profile
+
+# Linux ioctls from <linux/fs.h>; supported by btrfs, XFS (reflink=1), bcachefs, ...
+FICLONE = 0x40049409
+FICLONERANGE = 0x4020940D
+CLONE_RANGE_ARGS = struct.Struct("=qQQQ")  # src_fd, src_offset, src_length, dest_offset
+
+class BlockCache:
+    """
+    Uncompressed copies of blocks under `.shard/cache`, used as the source of
+    reflinked checkouts. Clones share extents with the cache, so N similar
+    checkouts cost roughly their unique content once.
+    """
+
+    def __init__(self, store: LocalStore):
+        self.store = store
+        self.cache_dir = os.path.join(store.root_dir, "cache")
+
+    def path(self, obj_hash: str) -> str:
+        return os.path.join(self.cache_dir, obj_hash[:2], obj_hash)
+
+    def ensure(self, obj_hash: str) -> str:
+        """Path of the uncompressed block, decompressing it from the store if needed."""
+        path = self.path(obj_hash)
+        if os.path.exists(path):
+            return path
+        data = decompress_chunk(self.store.read_object(obj_hash))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, data)
+        return path
+
+    def hashes(self) -> Iterator[str]:
+        if not os.path.exists(self.cache_dir):
+            return
+        for _, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not is_temp(name):
+                    yield name
+
+    def remove(self, obj_hash: str) -> int:
+        """Drop a cached block. Returns the bytes removed."""
+        path = self.path(obj_hash)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+        return size
+
+def clone_range(src_fd: int, dst_fd: int, src_offset: int, length: int, dst_offset: int):
+    """Share `length` bytes of src with dst (copy-on-write). Raises OSError if unsupported."""
+    import fcntl
+    fcntl.ioctl(dst_fd, FICLONERANGE, CLONE_RANGE_ARGS.pack(src_fd, src_offset, length, dst_offset))
+
+def reflink_supported(directory: str) -> bool:
+    """Whether files in `directory` can be reflinked (probed with a throwaway file)."""
+    try:
+        import fcntl
+    except ImportError:  # Not on Linux/Unix
+        return False
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryFile(dir=directory) as src, tempfile.TemporaryFile(dir=directory) as dst:
+        src.write(b"\0" * 4096)
+        src.flush()
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            return False
+    return True
+
+def _copy_range(src_fd: int, dst_fd: int, length: int, dst_offset: int):
+    offset = 0
+    while offset < length:
+        chunk = os.pread(src_fd, min(length - offset, 16 * 1024 * 1024), offset)
+        if not chunk:
+            raise OSError(f"Unexpected end of cached block after {offset} bytes.")
+        os.pwrite(dst_fd, chunk, dst_offset + offset)
+        offset += len(chunk)
+
+def checkout_reflinked(manifest: Dict[str, Any], store: LocalStore, out_path: str) -> Dict[str, int]:
+    """
+    Assemble `out_path` by cloning each block's extents from the block cache.
+    Blocks that cannot be cloned (e.g. unaligned, or the cache is on another
+    filesystem) are copied instead. Returns counts of cloned and copied blocks.
+    """
+    cache = BlockCache(store)
+    total = sum(b["size"] for b in manifest["blocks"])
+    counts = {"cloned": 0, "copied": 0}
+
+    tmp_path = out_path + ".partial"
+    fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # Full size up front so the final (unaligned) block ends at EOF, which
+        # clone requires for a partial filesystem block.
+        os.ftruncate(fd, total)
+        offset = 0
+        for block in manifest["blocks"]:
+            src_path = cache.ensure(block["hash"])
+            src_fd = os.open(src_path, os.O_RDONLY)
+            try:
+                with profile.stage("reflink.clone", block["size"]):
+                    try:
+                        clone_range(src_fd, fd, 0, block["size"], offset)
+                        counts["cloned"] += 1
+                    except OSError:
+                        _copy_range(src_fd, fd, block["size"], offset)
+                        counts["copied"] += 1
+            finally:
+                os.close(src_fd)
+            offset += block["size"]
+    except BaseException:
+        os.close(fd)
+        os.remove(tmp_path)
+        raise
+    os.close(fd)
+    os.replace(tmp_path, out_path)
+    return counts
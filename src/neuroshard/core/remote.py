@@ -1,37 +1,286 @@
 import requests
 import os
+import time
+import queue
+import random
+import hashlib
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from neuroshard.core import profile
+from neuroshard.core.bundle import BundleDecoder, BundleError, iter_encode
+
+# Status codes worth retrying: the request may succeed if sent again.
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Returned for the batch endpoints (/blocks/missing, /bundles) by servers that
+# predate them; the client falls back to one request per block.
+UNSUPPORTED_STATUSES = {404, 405}
+
+# (connect, read) seconds for the origin. The read timeout bounds a stalled
+# connection, not a transfer: it applies between bytes (and while the server
+# verifies and stores an upload before replying), so retries can kick in.
+ORIGIN_TIMEOUT = (10, 300)
+
+# Peers are tried once, with short timeouts, and skipped for a while after failing.
+PEER_TIMEOUT = (3, 30)  # (connect, read) seconds
+PEER_COOLDOWN = 30.0
+PEER_QUEUE = 16  # Records buffered per download_bundle while sources run ahead
+
+_DONE = object()
 
 class RemoteClient:
-    def __init__(self, base_url: str, token: str = None):
+    """
+    Client for a NeuroShard server (the origin). Block downloads can also be
+    spread across `peers`: other block servers, e.g. neighbours' stores served
+    with `nshard serve --read-only`. Every block is assigned to one source by
+    its hash; peer data is verified against the hash, and anything a peer
+    lacks or serves corrupted is fetched from the origin instead.
+    """
+
+    def __init__(self, base_url: str, token: str = None, retries: int = 5, backoff: float = 0.5,
+                 peers: List[str] = None, timeout=ORIGIN_TIMEOUT):
         self.base_url = base_url.rstrip("/")
         self.token = token
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
         self.session = requests.Session()
         if token:
             self.session.headers.update({"Authorization": f"Bearer {token}"})
+        self.peers = [RemoteClient(url, retries=0, timeout=PEER_TIMEOUT) for url in peers or []]
+        self.down_until = 0.0  # Set on peers that recently failed
+        self.batch_api = True  # Cleared once the server turns out not to have the batch endpoints
+
+    def _request(self, method: str, path: str, body: Callable = None, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying transient failures with exponential backoff.
+        `body` is called for a fresh request body on each attempt (for streams).
+        """
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.retries + 1):
+            if body is not None:
+                kwargs["data"] = body()
+            try:
+                resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                if resp.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return resp
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            profile.count("remote.retries")
+            time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
 
     def has_block(self, obj_hash: str) -> bool:
         """Check if remote has a block."""
-        resp = self.session.head(f"{self.base_url}/blocks/{obj_hash}")
+        with profile.stage("remote.has_block"):
+            resp = self._request("HEAD", f"/blocks/{obj_hash}")
         return resp.status_code == 200
 
     def upload_block(self, obj_hash: str, data: bytes):
         """Upload a block to remote."""
-        resp = self.session.put(f"{self.base_url}/blocks/{obj_hash}", data=data)
+        with profile.stage("remote.upload_block", len(data)):
+            resp = self._request("PUT", f"/blocks/{obj_hash}", data=data)
         resp.raise_for_status()
 
+    def _peer_for(self, obj_hash: str) -> Optional["RemoteClient"]:
+        """The peer assigned to a block, or None for the origin."""
+        if not self.peers:
+            return None
+        i = int(obj_hash[:8], 16) % (len(self.peers) + 1)
+        if i == 0:
+            return None
+        peer = self.peers[i - 1]
+        return peer if peer.down_until <= time.monotonic() else None
+
+    def _peer_failed(self, peer: "RemoteClient"):
+        peer.down_until = time.monotonic() + PEER_COOLDOWN
+        profile.count("remote.peer_errors")
+
     def download_block(self, obj_hash: str) -> bytes:
-        """Download a block from remote."""
-        resp = self.session.get(f"{self.base_url}/blocks/{obj_hash}")
+        """Download a block from its assigned peer, else from the origin."""
+        peer = self._peer_for(obj_hash)
+        if peer is not None:
+            try:
+                with profile.stage("remote.peer_download_block"):
+                    resp = peer._request("GET", f"/blocks/{obj_hash}")
+                if resp.status_code == 200 and hashlib.sha256(resp.content).hexdigest() == obj_hash:
+                    profile.count("remote.peer_blocks")
+                    return resp.content
+                if resp.status_code != 404:
+                    self._peer_failed(peer)
+            except requests.RequestException:
+                self._peer_failed(peer)
+
+        with profile.stage("remote.download_block") as span:
+            resp = self._request("GET", f"/blocks/{obj_hash}")
+            span.nbytes = len(resp.content)
         resp.raise_for_status()
         return resp.content
 
+    def _unsupported(self, resp: requests.Response) -> bool:
+        """True if `resp` means the server lacks a batch endpoint (it is then not tried again)."""
+        if resp.status_code not in UNSUPPORTED_STATUSES:
+            return False
+        self.batch_api = False
+        profile.count("remote.batch_fallbacks")
+        return True
+
+    def missing_blocks(self, hashes: List[str]) -> List[str]:
+        """Return the hashes the remote doesn't have, in one round trip (one HEAD each on older servers)."""
+        if self.batch_api:
+            with profile.stage("remote.missing_blocks"):
+                resp = self._request("POST", "/blocks/missing", json={"hashes": hashes})
+            if not self._unsupported(resp):
+                resp.raise_for_status()
+                return resp.json()["missing"]
+        return [h for h in hashes if not self.has_block(h)]
+
+    def upload_bundle(self, records: Callable[[], Iterable[Tuple[str, bytes]]]):
+        """
+        Stream many blocks to the remote in a single request (one PUT each on older servers).
+        `records` returns a fresh iterable of (hash, data) so the upload can be retried.
+        """
+        if self.batch_api:
+            with profile.stage("remote.upload_bundle"):
+                resp = self._request("POST", "/bundles", body=lambda: iter_encode(records()))
+            if not self._unsupported(resp):
+                resp.raise_for_status()
+                return resp.json()
+        stored = 0
+        for obj_hash, data in records():
+            self.upload_block(obj_hash, data)
+            stored += 1
+        return {"status": "ok", "stored": stored, "skipped": 0}
+
+    def download_bundle(self, hashes: List[str]) -> Iterator[Tuple[str, bytes]]:
+        """
+        Download many blocks in a single streamed request, yielding (hash, data).
+        If the stream breaks, the blocks not yet received are requested again.
+        Blocks the remote doesn't have are simply not yielded.
+        With peers, each source streams its share concurrently; blocks a peer
+        didn't deliver are then requested from the origin.
+        """
+        if not self.peers:
+            yield from self._download_bundle(hashes)
+            return
+
+        shares = {}
+        for obj_hash in hashes:
+            shares.setdefault(self._peer_for(obj_hash), []).append(obj_hash)
+
+        results = queue.Queue(maxsize=PEER_QUEUE)
+        stop = threading.Event()
+        leftovers = []
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    profile.gauge("remote.peer_queue", results.qsize())
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce(source: Optional["RemoteClient"], share: List[str]):
+            received = set()
+            error = None
+            try:
+                if source is None:
+                    records = self._download_bundle(share)
+                else:
+                    records = source._stream_bundle(share)
+                for obj_hash, data in records:
+                    if source is not None and hashlib.sha256(data).hexdigest() != obj_hash:
+                        raise BundleError(f"Peer sent a corrupt block {obj_hash}.")
+                    received.add(obj_hash)
+                    if not put((obj_hash, data)):
+                        return
+            except (requests.RequestException, BundleError) as e:
+                if source is None:
+                    error = e
+                else:
+                    self._peer_failed(source)
+            except BaseException as e:
+                error = e
+            if source is not None:
+                profile.count("remote.peer_blocks", len(received))
+                leftovers.extend(h for h in share if h not in received)
+            put((_DONE, error))
+
+        threads = [threading.Thread(target=produce, args=item, daemon=True) for item in shares.items()]
+        for t in threads:
+            t.start()
+        try:
+            pending = len(threads)
+            while pending:
+                obj_hash, data = results.get()
+                if obj_hash is _DONE:
+                    pending -= 1
+                    if data is not None:
+                        raise data
+                    continue
+                yield obj_hash, data
+        finally:
+            stop.set()
+
+        if leftovers:
+            yield from self._download_bundle(leftovers)
+
+    def _download_bundle(self, hashes: List[str]) -> Iterator[Tuple[str, bytes]]:
+        """download_bundle from the origin only."""
+        remaining = list(hashes)
+        for attempt in range(self.retries + 1):
+            received = set()
+            try:
+                for obj_hash, data in self._stream_bundle(remaining):
+                    received.add(obj_hash)
+                    yield obj_hash, data
+                return
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, BundleError):
+                if attempt == self.retries:
+                    raise
+            remaining = [h for h in remaining if h not in received]
+            profile.count("remote.retries")
+            time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def _stream_bundle(self, hashes: List[str]) -> Iterator[Tuple[str, bytes]]:
+        if not self.batch_api:
+            yield from self._download_blocks(hashes)
+            return
+        with profile.stage("remote.download_bundle"):
+            resp = self._request("POST", "/bundles/download", json={"hashes": hashes}, stream=True)
+        if self._unsupported(resp):
+            resp.close()
+            yield from self._download_blocks(hashes)
+            return
+        resp.raise_for_status()
+        decoder = BundleDecoder()
+        with resp:
+            for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                yield from decoder.feed(chunk)
+        decoder.close()
+
+    def _download_blocks(self, hashes: List[str]) -> Iterator[Tuple[str, bytes]]:
+        """One GET per block, for servers without bundles. Absent blocks are skipped."""
+        for obj_hash in hashes:
+            with profile.stage("remote.download_block") as span:
+                resp = self._request("GET", f"/blocks/{obj_hash}")
+                span.nbytes = len(resp.content)
+            if resp.status_code == 404:
+                continue
+            resp.raise_for_status()
+            yield obj_hash, resp.content
+
     def upload_manifest(self, manifest_hash: str, data: bytes):
         """Upload a manifest to remote."""
-        resp = self.session.put(f"{self.base_url}/manifests/{manifest_hash}", data=data)
+        with profile.stage("remote.upload_manifest", len(data)):
+            resp = self._request("PUT", f"/manifests/{manifest_hash}", data=data)
         resp.raise_for_status()
 
     def download_manifest(self, manifest_hash: str) -> bytes:
         """Download a manifest from remote."""
-        resp = self.session.get(f"{self.base_url}/manifests/{manifest_hash}")
+        with profile.stage("remote.download_manifest"):
+            resp = self._request("GET", f"/manifests/{manifest_hash}")
         resp.raise_for_status()
         return resp.content
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import struct
+import fnmatch
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from neuroshard.core.store import LocalStore
+from neuroshard.core.chunker import sha256_bytes, decompress_chunk
+from neuroshard.core import profile
+
+# Blocks fetched per request. Small enough that priority order is kept across
+# concurrent workers, large enough to amortize a request.
+BATCH_BLOCKS = 8
+
+SIZE_SUFFIXES = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+def parse_size(text: str) -> int:
+    """Parse a byte count such as 4096, 64K, 16M or 1G."""
+    text = text.strip().upper().rstrip("B")
+    suffix = text[-1:] if text[-1:] in SIZE_SUFFIXES else ""
+    return int(float(text[:len(text) - len(suffix)]) * SIZE_SUFFIXES[suffix])
+
+def block_layout(manifest: Dict[str, Any]) -> List[Tuple[int, int, str]]:
+    """(offset, size, hash) of every block position in the restored file."""
+    layout = []
+    offset = 0
+    for block in manifest["blocks"]:
+        layout.append((offset, block["size"], block["hash"]))
+        offset += block["size"]
+    return layout
+
+def blocks_in_range(layout: List[Tuple[int, int, str]], start: int, end: int) -> List[str]:
+    """Hashes of blocks overlapping the byte range [start, end), in file order."""
+    return [h for offset, size, h in layout if offset < end and offset + size > start]
+
+def safetensors_ranges(header: Dict[str, Any], header_end: int, patterns: Sequence[str]) -> List[Tuple[int, int]]:
+    """Byte ranges of tensors whose names match any of `patterns`, in header order."""
+    ranges = []
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        if any(fnmatch.fnmatchcase(name, p) for p in patterns):
+            start, end = info["data_offsets"]
+            ranges.append((header_end + start, header_end + end))
+    return sorted(ranges)
+
+class StreamingCheckout:
+    """
+    Restore a file from its manifest while its blocks are still downloading.
+
+    Missing blocks are fetched from `client` by several workers at once; each
+    block is verified, added to the store, decompressed and written at its
+    offset(s) as soon as it arrives, so download and decompression overlap.
+    Blocks already in the store are restored from disk. The output is written
+    to `<path>.partial` and renamed into place once complete.
+
+    `priority` hints are fetched first, in order:
+      "header"       the safetensors header
+      "START:END"    a byte range, e.g. "0:64M"
+      anything else  a glob over safetensors tensor names, e.g. "model.layers.0.*"
+    """
+
+    def __init__(self, manifest: Dict[str, Any], store: LocalStore, client=None, workers: int = 4,
+                 batch_blocks: int = BATCH_BLOCKS, on_block: Optional[Callable[[str], None]] = None):
+        self.manifest = manifest
+        self.store = store
+        self.client = client
+        self.workers = max(1, workers)
+        self.batch_blocks = max(1, batch_blocks)
+        self.on_block = on_block
+
+        self.layout = block_layout(manifest)
+        self.total_size = sum(size for _, size, _ in self.layout)
+        self.offsets = defaultdict(list)
+        for offset, _, h in self.layout:
+            self.offsets[h].append(offset)
+
+        self._fd = None
+        self._started = None
+        self._lock = threading.Lock()
+        self._done = set()
+        self._priority_left = set()
+        self.stats = {"blocks": len(self.offsets), "downloaded": 0, "downloaded_bytes": 0,
+                      "priority_ready": None, "elapsed": None}
+
+    def run(self, out_path: str, priority: Sequence[str] = ()) -> Dict[str, Any]:
+        self._started = time.perf_counter()
+        tmp_path = out_path + ".partial"
+        self._fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(self._fd, self.total_size)
+            order = [h for h in self._priority_order(priority) if h not in self._done]
+            with self._lock:
+                self._priority_left = set(order)
+                if not self._priority_left:
+                    self.stats["priority_ready"] = time.perf_counter() - self._started
+
+            # Priority blocks first, then the rest in file order. The pool runs
+            # batches FIFO, so earlier batches start first.
+            queue = [h for h in dict.fromkeys(order + [h for _, _, h in self.layout]) if h not in self._done]
+            batches = [queue[i:i + self.batch_blocks] for i in range(0, len(queue), self.batch_blocks)]
+            pending = [len(batches)]
+            profile.gauge("restore.pending_batches", pending[0])
+
+            def batch_done(_):
+                with self._lock:
+                    pending[0] -= 1
+                    profile.gauge("restore.pending_batches", pending[0])
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self._fetch, batch) for batch in batches]
+                for future in futures:
+                    future.add_done_callback(batch_done)
+                for future in futures:
+                    future.result()
+            os.fsync(self._fd)
+        except BaseException:
+            os.close(self._fd)
+            self._fd = None
+            os.remove(tmp_path)
+            raise
+        os.close(self._fd)
+        self._fd = None
+        os.replace(tmp_path, out_path)
+        self.stats["elapsed"] = time.perf_counter() - self._started
+        return self.stats
+
+    def _priority_order(self, hints: Sequence[str]) -> List[str]:
+        order = []
+        header = None
+        for hint in hints:
+            if ":" in hint and not any(c in hint for c in "*?["):
+                start, end = hint.split(":", 1)
+                start = parse_size(start) if start else 0
+                end = parse_size(end) if end else self.total_size
+                order += blocks_in_range(self.layout, start, end)
+                continue
+            if header is None:
+                header = self._read_safetensors_header()
+            tensors, header_end = header
+            if hint == "header":
+                order += blocks_in_range(self.layout, 0, header_end)
+            else:
+                for start, end in safetensors_ranges(tensors, header_end, [hint]):
+                    order += blocks_in_range(self.layout, start, end)
+        return list(dict.fromkeys(order))
+
+    def _read_prefix(self, n: int) -> bytes:
+        """Restore the blocks covering the first n bytes right away and read them back."""
+        self._fetch([h for h in blocks_in_range(self.layout, 0, n) if h not in self._done])
+        return os.pread(self._fd, n, 0)
+
+    def _read_safetensors_header(self) -> Tuple[Dict[str, Any], int]:
+        if self.total_size < 8:
+            raise ValueError("File is too small to be a safetensors file.")
+        (length,) = struct.unpack("<Q", self._read_prefix(8))
+        if 8 + length > self.total_size:
+            raise ValueError("Not a safetensors file (header length out of range).")
+        try:
+            header = json.loads(self._read_prefix(8 + length)[8:])
+        except ValueError:
+            raise ValueError("Not a safetensors file (header is not JSON).")
+        return header, 8 + length
+
+    def _fetch(self, hashes: List[str]):
+        remote = []
+        for h in hashes:
+            if self.store.has_object(h):
+                self._place(h, self.store.read_object(h))
+            else:
+                remote.append(h)
+        if not remote:
+            return
+        if self.client is None:
+            raise FileNotFoundError(f"Block {remote[0]} missing locally.")
+
+        if len(remote) == 1:
+            records = [(remote[0], self.client.download_block(remote[0]))]
+        else:
+            records = self.client.download_bundle(remote)
+        received = set()
+        for h, data in records:
+            if sha256_bytes(data) != h:
+                raise ValueError(f"Block {h} failed verification.")
+            self.store.write_object(h, data)
+            with self._lock:
+                self.stats["downloaded"] += 1
+                self.stats["downloaded_bytes"] += len(data)
+            self._place(h, data)
+            received.add(h)
+        for h in remote:
+            if h not in received:
+                raise FileNotFoundError(f"Block {h} not found on remote.")
+
+    def _place(self, h: str, compressed: bytes):
+        data = decompress_chunk(compressed)
+        with profile.stage("restore.write", len(data) * len(self.offsets[h])):
+            for offset in self.offsets[h]:
+                os.pwrite(self._fd, data, offset)
+        with self._lock:
+            self._done.add(h)
+            if h in self._priority_left:
+                self._priority_left.discard(h)
+                if not self._priority_left:
+                    self.stats["priority_ready"] = time.perf_counter() - self._started
+        if self.on_block:
+            self.on_block(h)
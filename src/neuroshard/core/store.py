@@ -1,5 +1,7 @@
 import os
 import shutil
+from neuroshard.core import profile
+from neuroshard.core.fsutil import FileLock, atomic_write
 
 class LocalStore:
     def __init__(self, root_dir: str = ".shard"):
@@ -17,23 +19,54 @@ class LocalStore:
         path = self._get_object_path(obj_hash)
         return os.path.exists(path)
 
+    def lock(self, shared: bool = True) -> FileLock:
+        """
+        Store-wide lock. Anything that writes objects and then the manifests
+        referencing them (commit, pull, import, the API) holds it shared until
+        the manifests are written and indexed; gc holds it exclusively, so it
+        never removes blocks, new or deduplicated, that nothing references yet.
+        """
+        return FileLock(os.path.join(self.root_dir, "lock"), shared=shared)
+
     def write_object(self, obj_hash: str, data: bytes):
         """Write a compressed object to the store if it doesn't exist."""
         if self.has_object(obj_hash):
             return
         
         path = self._get_object_path(obj_hash)
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "wb") as f:
-            f.write(data)
+        with profile.stage("store.write_object", len(data)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Objects appear complete or not at all, so an existing object is
+            # always safe to dedup against, even with concurrent writers.
+            atomic_write(path, data)
+
+    def replace_object(self, obj_hash: str, data: bytes):
+        """Overwrite an object (e.g. a corrupt one) in place; readers never see it missing."""
+        path = self._get_object_path(obj_hash)
+        with profile.stage("store.write_object", len(data)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
 
     def read_object(self, obj_hash: str) -> bytes:
         """Read a compressed object from the store."""
         path = self._get_object_path(obj_hash)
         if not os.path.exists(path):
             raise FileNotFoundError(f"Object {obj_hash} not found in store.")
-        with open(path, "rb") as f:
-            return f.read()
+        with profile.stage("store.read_object") as span:
+            with open(path, "rb") as f:
+                data = f.read()
+            span.nbytes = len(data)
+        return data
+
+    def object_size(self, obj_hash: str) -> int:
+        """Size in bytes of a stored (compressed) object."""
+        return os.path.getsize(self._get_object_path(obj_hash))
+
+    def remove_object(self, obj_hash: str):
+        """Remove an object from the store if present."""
+        path = self._get_object_path(obj_hash)
+        if os.path.exists(path):
+            os.remove(path)
 
     def _get_object_path(self, obj_hash: str) -> str:
         """Get the filesystem path for an object hash (sharded by first 2 chars)."""
@@ -42,8 +75,8 @@ class LocalStore:
     def write_manifest(self, manifest_hash: str, data: bytes):
         """Write a manifest file."""
         path = os.path.join(self.manifests_dir, manifest_hash)
-        with open(path, "wb") as f:
-            f.write(data)
+        with profile.stage("store.write_manifest", len(data)):
+            atomic_write(path, data)
             
     def read_manifest(self, manifest_hash: str) -> bytes:
         """Read a manifest file."""
@@ -0,0 +1,228 @@
+import json
+import bisect
+import struct
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from neuroshard.core.store import LocalStore
+from neuroshard.core.chunker import decompress_chunk
+
+# Bytes compared per step; bounds memory for large tensors.
+STEP_BYTES = 4 * 1024 * 1024
+
+# safetensors refuses headers larger than this, so a bigger length means the
+# file is something else.
+MAX_HEADER_BYTES = 100 * 1024 * 1024
+
+# safetensors dtype -> numpy dtype name. BF16 is widened to float32 by hand.
+SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8",
+    "U64": "uint64", "U32": "uint32", "U16": "uint16", "U8": "uint8", "BOOL": "bool",
+}
+ITEMSIZES = {"float64": 8, "float32": 4, "float16": 2, "bfloat16": 2, "int64": 8, "int32": 4,
+             "int16": 2, "int8": 1, "uint64": 8, "uint32": 4, "uint16": 2, "uint8": 1, "bool": 1}
+
+def block_changes(old_blocks: List[Dict[str, Any]], new_blocks: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Compare two block lists position by position."""
+    counts = {"unchanged": 0, "changed": 0, "added": 0, "removed": 0}
+    for i in range(max(len(old_blocks), len(new_blocks))):
+        if i >= len(old_blocks):
+            counts["added"] += 1
+        elif i >= len(new_blocks):
+            counts["removed"] += 1
+        elif old_blocks[i]["hash"] == new_blocks[i]["hash"]:
+            counts["unchanged"] += 1
+        else:
+            counts["changed"] += 1
+    return counts
+
+class BlockReader:
+    """Random access to a manifest's bytes, decompressing blocks from the store on demand."""
+
+    def __init__(self, manifest: Dict[str, Any], store: LocalStore, cache_blocks: int = 4):
+        self.store = store
+        self.layout = []  # (offset, size, hash)
+        offset = 0
+        for block in manifest["blocks"]:
+            self.layout.append((offset, block["size"], block["hash"]))
+            offset += block["size"]
+        self.size = offset
+        self._offsets = [b[0] for b in self.layout]
+        self.decompressed = 0
+        self._cache = OrderedDict()
+        self._cache_blocks = cache_blocks
+
+    def blocks(self, start: int, end: int) -> List[Tuple[int, int, str]]:
+        """Blocks overlapping [start, end)."""
+        i = max(bisect.bisect_right(self._offsets, start) - 1, 0)
+        found = []
+        while i < len(self.layout) and self.layout[i][0] < end:
+            if self.layout[i][0] + self.layout[i][1] > start:
+                found.append(self.layout[i])
+            i += 1
+        return found
+
+    def _block(self, obj_hash: str) -> bytes:
+        data = self._cache.get(obj_hash)
+        if data is None:
+            data = decompress_chunk(self.store.read_object(obj_hash))
+            self.decompressed += 1
+            self._cache[obj_hash] = data
+            if len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(obj_hash)
+        return data
+
+    def read(self, start: int, end: int) -> bytes:
+        parts = []
+        for offset, size, obj_hash in self.blocks(start, end):
+            data = self._block(obj_hash)
+            parts.append(data[max(start - offset, 0):min(end - offset, size)])
+        return b"".join(parts)
+
+def same_bytes(old: BlockReader, new: BlockReader, old_start: int, new_start: int, length: int) -> bool:
+    """True if both ranges are covered by the same blocks at the same relative offsets (no reads needed)."""
+    a = old.blocks(old_start, old_start + length)
+    b = new.blocks(new_start, new_start + length)
+    if len(a) != len(b):
+        return False
+    return all(x[2] == y[2] and x[1] == y[1] and x[0] - old_start == y[0] - new_start for x, y in zip(a, b))
+
+def read_safetensors_header(reader: BlockReader) -> Optional[Tuple[Dict[str, Any], int]]:
+    """(tensors, data start offset) if the manifest looks like a safetensors file, else None."""
+    if reader.size < 8:
+        return None
+    (length,) = struct.unpack("<Q", reader.read(0, 8))
+    if length < 2 or length > MAX_HEADER_BYTES or 8 + length > reader.size:
+        return None
+    # Check the JSON opens before reading (and decompressing) the whole header.
+    if reader.read(8, 9) != b"{":
+        return None
+    try:
+        header = json.loads(reader.read(8, 8 + length))
+    except ValueError:
+        return None
+    if not isinstance(header, dict):
+        return None
+    header.pop("__metadata__", None)
+    return header, 8 + length
+
+def _as_array(np, data: bytes, dtype: str):
+    if dtype == "bfloat16":
+        return (np.frombuffer(data, dtype="<u2").astype(np.uint32) << 16).view(np.float32)
+    return np.frombuffer(data, dtype=np.dtype(dtype).newbyteorder("<"))
+
+def region_stats(np, old: BlockReader, new: BlockReader, old_start: int, new_start: int, length: int,
+                 dtype: str) -> Dict[str, Any]:
+    """
+    Numeric change statistics between two equally sized ranges. Ranges made
+    of identical blocks are skipped without reading; the rest is compared in
+    STEP_BYTES pieces.
+    """
+    itemsize = ITEMSIZES[dtype]
+    step = max(STEP_BYTES // itemsize, 1) * itemsize
+    elements = length // itemsize
+    changed = 0
+    max_abs = 0.0
+    sum_sq = 0.0
+
+    for pos in range(0, elements * itemsize, step):
+        n = min(step, elements * itemsize - pos)
+        if same_bytes(old, new, old_start + pos, new_start + pos, n):
+            continue
+        a = _as_array(np, old.read(old_start + pos, old_start + pos + n), dtype)
+        b = _as_array(np, new.read(new_start + pos, new_start + pos + n), dtype)
+        # Compare bit patterns so NaNs that didn't change don't count as changed.
+        bits = np.dtype(f"u{a.dtype.itemsize}") if a.dtype.itemsize > 1 else np.uint8
+        mask = a.view(bits) != b.view(bits)
+        count = int(np.count_nonzero(mask))
+        if not count:
+            continue
+        changed += count
+        delta = b[mask].astype(np.float64) - a[mask].astype(np.float64)
+        finite = delta[np.isfinite(delta)]
+        if finite.size:
+            max_abs = max(max_abs, float(np.max(np.abs(finite))))
+            sum_sq += float(np.dot(finite, finite))
+
+    return {
+        "elements": elements,
+        "changed": changed,
+        "changed_fraction": changed / elements if elements else 0.0,
+        "max_abs_delta": max_abs,
+        "l2_delta": sum_sq ** 0.5,
+    }
+
+def diff_manifests(old_manifest: Dict[str, Any], new_manifest: Dict[str, Any], store: LocalStore,
+                   dtype: str = "float32") -> Dict[str, Any]:
+    """
+    Tensor-level diff of two manifests, read straight from the store.
+
+    safetensors files are compared tensor by tensor (matched by name, so
+    header changes that shift offsets are handled). Other files are compared
+    as `dtype` arrays in block-sized regions aligned by position. Only blocks
+    that differ are decompressed.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("Tensor diffs need NumPy: pip install 'neuroshard[tensor]'")
+
+    old = BlockReader(old_manifest, store)
+    new = BlockReader(new_manifest, store)
+    report = {
+        "blocks": block_changes(old_manifest["blocks"], new_manifest["blocks"]),
+        "format": "raw",
+        "regions": [],
+        "added": [],
+        "removed": [],
+    }
+
+    old_header = read_safetensors_header(old)
+    new_header = read_safetensors_header(new) if old_header else None
+    if old_header and new_header:
+        report["format"] = "safetensors"
+        (old_tensors, old_base), (new_tensors, new_base) = old_header, new_header
+        report["added"] = sorted(set(new_tensors) - set(old_tensors))
+        report["removed"] = sorted(set(old_tensors) - set(new_tensors))
+        for name in sorted(set(old_tensors) & set(new_tensors)):
+            a, b = old_tensors[name], new_tensors[name]
+            region = {"name": name, "dtype": a["dtype"], "shape": b["shape"]}
+            if a["dtype"] != b["dtype"] or a["shape"] != b["shape"]:
+                region.update(status="reshaped", old_dtype=a["dtype"], old_shape=a["shape"], dtype=b["dtype"])
+                report["regions"].append(region)
+                continue
+            a_start, a_end = a["data_offsets"]
+            b_start = b["data_offsets"][0]
+            np_dtype = SAFETENSORS_DTYPES.get(a["dtype"], "uint8")
+            region.update(region_stats(np, old, new, old_base + a_start, new_base + b_start, a_end - a_start, np_dtype))
+            region["status"] = "changed" if region["changed"] else "unchanged"
+            report["regions"].append(region)
+    else:
+        itemsize = ITEMSIZES[dtype]
+        common = min(old.size, new.size)
+        for i, (offset, size, _) in enumerate(old.layout):
+            if offset >= common:
+                break
+            length = (min(size, common - offset) // itemsize) * itemsize
+            region = {"name": f"block {i}", "offset": offset, "dtype": dtype}
+            region.update(region_stats(np, old, new, offset, offset, length, dtype))
+            region["status"] = "changed" if region["changed"] else "unchanged"
+            report["regions"].append(region)
+        if new.size > old.size:
+            report["added"] = [f"bytes {old.size}-{new.size}"]
+        elif old.size > new.size:
+            report["removed"] = [f"bytes {new.size}-{old.size}"]
+
+    changed = [r for r in report["regions"] if r["status"] != "unchanged"]
+    report["summary"] = {
+        "regions": len(report["regions"]),
+        "changed_regions": len(changed),
+        "changed_elements": sum(r.get("changed", 0) for r in changed),
+        "elements": sum(r.get("elements", 0) for r in report["regions"]),
+        "max_abs_delta": max((r.get("max_abs_delta", 0.0) for r in changed), default=0.0),
+        "l2_delta": sum(r.get("l2_delta", 0.0) ** 2 for r in changed) ** 0.5,
+        "blocks_decompressed": old.decompressed + new.decompressed,
+    }
+    return report
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable
+from neuroshard.core.store import LocalStore
+from neuroshard.core.fsutil import atomic_write, is_temp
+from neuroshard.core.chunker import sha256_bytes, decompress_chunk
+from neuroshard.core import profile
+
+class RateLimiter:
+    """Caps the average read rate (bytes/sec) shared across worker threads."""
+
+    def __init__(self, bytes_per_sec: float):
+        self.rate = bytes_per_sec
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self, nbytes: int):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + nbytes / self.rate
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+class VerifyState:
+    """
+    Progress of an interrupted verify run, so the next run can resume.
+    Objects already verified are skipped until the run completes.
+    """
+
+    def __init__(self, root_dir: str = ".shard"):
+        self.path = os.path.join(root_dir, "verify-state.json")
+
+    def load(self) -> set:
+        if not os.path.exists(self.path):
+            return set()
+        try:
+            with open(self.path, "r") as f:
+                return set(json.load(f)["verified"])
+        except (OSError, ValueError, KeyError):
+            return set()
+
+    def save(self, verified: set):
+        atomic_write(self.path, json.dumps({"verified": list(verified)}).encode("utf-8"))
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def referenced_sizes(store: LocalStore) -> Dict[str, int]:
+    """Map every block hash referenced by a manifest to its uncompressed size."""
+    sizes = {}
+    if not os.path.exists(store.manifests_dir):
+        return sizes
+    for manifest_name in os.listdir(store.manifests_dir):
+        if is_temp(manifest_name):
+            continue
+        try:
+            manifest = json.loads(store.read_manifest(manifest_name))
+        except (OSError, ValueError):
+            continue
+        for block in manifest["blocks"]:
+            sizes[block["hash"]] = block["size"]
+    return sizes
+
+def check_object(store: LocalStore, obj_hash: str, expected_size: Optional[int] = None,
+                 limiter: Optional[RateLimiter] = None) -> Optional[str]:
+    """Return a description of what is wrong with an object, or None if it is intact."""
+    try:
+        data = store.read_object(obj_hash)
+    except FileNotFoundError:
+        return "missing"
+    if limiter is not None:
+        limiter.acquire(len(data))
+
+    with profile.stage("verify.hash", len(data)):
+        if sha256_bytes(data) != obj_hash:
+            return "hash mismatch"
+    if expected_size is not None:
+        try:
+            size = len(decompress_chunk(data))
+        except Exception as e:
+            return f"decompression failed ({e})"
+        if size != expected_size:
+            return f"size mismatch ({size} != {expected_size})"
+    return None
+
+def verify_store(
+    store: LocalStore,
+    workers: Optional[int] = None,
+    max_rate: Optional[float] = None,
+    resume: bool = True,
+    remote=None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Re-hash every object and check that all manifest blocks are present and
+    decode to their recorded sizes. Work is spread across threads (hashing and
+    zstd release the GIL). Bad or missing blocks are re-fetched from `remote`
+    when given. Returns a report dict.
+    """
+    sizes = referenced_sizes(store)
+
+    on_disk = set()
+    if os.path.exists(store.objects_dir):
+        for _, _, files in os.walk(store.objects_dir):
+            on_disk.update(name for name in files if not is_temp(name))
+
+    state = VerifyState(store.root_dir)
+    verified = state.load() if resume else set()
+    if not resume:
+        state.clear()
+
+    resumed = len(verified)
+    todo = sorted((on_disk | set(sizes)) - verified)
+    limiter = RateLimiter(max_rate) if max_rate else None
+    problems: Dict[str, str] = {}
+    lock = threading.Lock()
+    done = 0
+    last_save = time.monotonic()
+
+    def work(obj_hash: str):
+        nonlocal done, last_save
+        error = check_object(store, obj_hash, sizes.get(obj_hash), limiter)
+        with lock:
+            done += 1
+            if error is None:
+                verified.add(obj_hash)
+            else:
+                problems[obj_hash] = error
+            if time.monotonic() - last_save > 5:
+                state.save(verified)
+                last_save = time.monotonic()
+        if on_progress:
+            on_progress(done, len(todo))
+
+    pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+    futures = [pool.submit(work, obj_hash) for obj_hash in todo]
+    try:
+        for future in futures:
+            future.result()
+    except BaseException:
+        # Interrupted: drop queued work and keep what was verified so far.
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=True)
+        state.save(verified)
+        raise
+    pool.shutdown()
+
+    repaired = []
+    if remote is not None:
+        for obj_hash in sorted(problems):
+            if obj_hash not in sizes:
+                continue  # Unreferenced garbage; gc will remove it.
+            try:
+                data = remote.download_block(obj_hash)
+            except Exception:
+                continue
+            if sha256_bytes(data) != obj_hash:
+                continue
+            store.replace_object(obj_hash, data)
+            if check_object(store, obj_hash, sizes.get(obj_hash)) is None:
+                repaired.append(obj_hash)
+        for obj_hash in repaired:
+            del problems[obj_hash]
+
+    state.clear()
+    return {
+        "checked": len(todo),
+        "resumed": resumed,
+        "problems": problems,
+        "repaired": repaired,
+    }
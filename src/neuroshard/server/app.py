@@ -1,56 +1,394 @@
 import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
+from neuroshard.core import profile
+from neuroshard.core.bundle import BundleDecoder, BundleError, iter_encode
+from neuroshard.core.fsutil import atomic_write, is_temp
 
 app = FastAPI()
 
 # Simple storage for the server (can be replaced with S3 later)
-STORAGE_DIR = "server_storage"
+STORAGE_DIR = os.environ.get("NEUROSHARD_STORAGE_DIR", "server_storage")
 OBJECTS_DIR = os.path.join(STORAGE_DIR, "objects")
 MANIFESTS_DIR = os.path.join(STORAGE_DIR, "manifests")
+# Directories are created on first write (or by configure()), so importing
+# this module doesn't leave a store behind in the working directory.
 
-os.makedirs(OBJECTS_DIR, exist_ok=True)
-os.makedirs(MANIFESTS_DIR, exist_ok=True)
+# Read-only mode serves blocks and manifests but rejects uploads, e.g. to
+# share a client's .shard store with its peers.
+READ_ONLY = False
+
+def configure(storage_dir: str = None, read_only: bool = None):
+    """Serve another store directory (same layout as LocalStore) and/or toggle read-only mode."""
+    global STORAGE_DIR, OBJECTS_DIR, MANIFESTS_DIR, READ_ONLY
+    if storage_dir is not None:
+        STORAGE_DIR = storage_dir
+        OBJECTS_DIR = os.path.join(storage_dir, "objects")
+        MANIFESTS_DIR = os.path.join(storage_dir, "manifests")
+        os.makedirs(OBJECTS_DIR, exist_ok=True)
+        os.makedirs(MANIFESTS_DIR, exist_ok=True)
+        metrics.store = None
+    if read_only is not None:
+        READ_ONLY = read_only
+
+# Blocks and manifests are named by their SHA-256; anything else could name a
+# path outside the store.
+HASH_RE = re.compile(r"[0-9a-f]{64}")
+
+def check_hash(obj_hash) -> str:
+    if not isinstance(obj_hash, str) or not HASH_RE.fullmatch(obj_hash):
+        raise HTTPException(status_code=400, detail="Invalid hash")
+    return obj_hash
 
 def get_object_path(obj_hash: str):
+    check_hash(obj_hash)
     return os.path.join(OBJECTS_DIR, obj_hash[:2], obj_hash)
 
+def get_manifest_path(manifest_hash: str):
+    return os.path.join(MANIFESTS_DIR, check_hash(manifest_hash))
+
+async def requested_hashes(request: Request) -> List[str]:
+    """The validated "hashes" list of a JSON request body."""
+    try:
+        hashes = (await request.json())["hashes"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Expected a JSON body with a list of hashes")
+    if not isinstance(hashes, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON body with a list of hashes")
+    return [check_hash(h) for h in hashes]
+
+# Prometheus-style metrics, exposed at /metrics
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class ServerMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (method, route, status) -> count
+        self.latency = {}   # (method, route) -> {"buckets": [...], "sum": s, "count": n}
+        self.bytes_in = {}
+        self.bytes_out = {}
+        self.store = None   # {"objects": n, "object_bytes": b}, computed on first use
+
+    def observe(self, method: str, route: str, status: int, seconds: float, bytes_in: int, bytes_out: int):
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            h = self.latency.get(key)
+            if h is None:
+                h = self.latency[key] = {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    h["buckets"][i] += 1
+            h["sum"] += seconds
+            h["count"] += 1
+            self.bytes_in[key] = self.bytes_in.get(key, 0) + bytes_in
+            self.bytes_out[key] = self.bytes_out.get(key, 0) + bytes_out
+
+    def add_bytes(self, method: str, route: str, bytes_in: int = 0, bytes_out: int = 0):
+        """Count bytes moved outside observe(), e.g. by a response that streams after it returns."""
+        key = (method, route)
+        with self._lock:
+            self.bytes_in[key] = self.bytes_in.get(key, 0) + bytes_in
+            self.bytes_out[key] = self.bytes_out.get(key, 0) + bytes_out
+
+    def store_stats(self):
+        with self._lock:
+            if self.store is None:
+                objects, total = 0, 0
+                for root, _, files in os.walk(OBJECTS_DIR):
+                    for name in files:
+                        if is_temp(name):
+                            continue
+                        objects += 1
+                        total += os.path.getsize(os.path.join(root, name))
+                self.store = {"objects": objects, "object_bytes": total}
+            return dict(self.store)
+
+    def object_added(self, nbytes: int):
+        with self._lock:
+            if self.store is not None:
+                self.store["objects"] += 1
+                self.store["object_bytes"] += nbytes
+
+    def render(self) -> str:
+        store = self.store_stats()
+        manifests = len([m for m in os.listdir(MANIFESTS_DIR) if not is_temp(m)]) if os.path.exists(MANIFESTS_DIR) else 0
+        lines = []
+        with self._lock:
+            lines.append("# TYPE neuroshard_requests_total counter")
+            for (method, route, status), n in sorted(self.requests.items()):
+                lines.append(f'neuroshard_requests_total{{method="{method}",route="{route}",status="{status}"}} {n}')
+
+            lines.append("# TYPE neuroshard_request_duration_seconds histogram")
+            for (method, route), h in sorted(self.latency.items()):
+                labels = f'method="{method}",route="{route}"'
+                for bound, n in zip(LATENCY_BUCKETS, h["buckets"]):
+                    lines.append(f'neuroshard_request_duration_seconds_bucket{{{labels},le="{bound}"}} {n}')
+                lines.append(f'neuroshard_request_duration_seconds_bucket{{{labels},le="+Inf"}} {h["count"]}')
+                lines.append(f"neuroshard_request_duration_seconds_sum{{{labels}}} {h['sum']}")
+                lines.append(f"neuroshard_request_duration_seconds_count{{{labels}}} {h['count']}")
+
+            for name, values in (("received", self.bytes_in), ("sent", self.bytes_out)):
+                lines.append(f"# TYPE neuroshard_bytes_{name}_total counter")
+                for (method, route), n in sorted(values.items()):
+                    lines.append(f'neuroshard_bytes_{name}_total{{method="{method}",route="{route}"}} {n}')
+
+        lines.append("# TYPE neuroshard_store_objects gauge")
+        lines.append(f"neuroshard_store_objects {store['objects']}")
+        lines.append("# TYPE neuroshard_store_object_bytes gauge")
+        lines.append(f"neuroshard_store_object_bytes {store['object_bytes']}")
+        lines.append("# TYPE neuroshard_store_manifests gauge")
+        lines.append(f"neuroshard_store_manifests {manifests}")
+        return "\n".join(lines) + "\n"
+
+metrics = ServerMetrics()
+
+class HotBlockCache:
+    """
+    Size-bounded LRU of block contents. Concurrent misses for the same block
+    are coalesced: one request reads from disk and the others wait for it.
+    Blocks are content-addressed, so entries never need invalidating.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # hash -> bytes, least recently used first
+        self._inflight = {}            # hash -> Future of the pending disk read
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, obj_hash: str, load: Callable[[str], Optional[bytes]]) -> Optional[bytes]:
+        """Return the block, calling `load` on a miss (None means not found)."""
+        with self._lock:
+            data = self._entries.get(obj_hash)
+            if data is not None:
+                self._entries.move_to_end(obj_hash)
+                self.hits += 1
+                return data
+            pending = self._inflight.get(obj_hash)
+            if pending is None:
+                pending = self._inflight[obj_hash] = Future()
+                self.misses += 1
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        data = None
+        try:
+            data = load(obj_hash)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                if data is not None:
+                    self._put(obj_hash, data)
+                del self._inflight[obj_hash]
+        pending.set_result(data)
+        return data
+
+    def _put(self, obj_hash: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        self._entries[obj_hash] = data
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# TYPE neuroshard_cache_hits_total counter",
+                f"neuroshard_cache_hits_total {self.hits}",
+                "# TYPE neuroshard_cache_misses_total counter",
+                f"neuroshard_cache_misses_total {self.misses}",
+                "# TYPE neuroshard_cache_coalesced_total counter",
+                f"neuroshard_cache_coalesced_total {self.coalesced}",
+                "# TYPE neuroshard_cache_bytes gauge",
+                f"neuroshard_cache_bytes {self.bytes}",
+                "# TYPE neuroshard_cache_entries gauge",
+                f"neuroshard_cache_entries {len(self._entries)}",
+            ]
+        return "\n".join(lines) + "\n"
+
+# NEUROSHARD_SERVER_CACHE_MB=0 disables caching (disk reads are still coalesced).
+block_cache = HotBlockCache(int(float(os.environ.get("NEUROSHARD_SERVER_CACHE_MB", "512")) * 1024 * 1024))
+
+# Blocks never change once written, so clients and proxies may cache them forever.
+IMMUTABLE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+def read_block(obj_hash: str) -> Optional[bytes]:
+    path = get_object_path(obj_hash)
+    try:
+        with profile.stage("server.read_block") as span:
+            with open(path, "rb") as f:
+                data = f.read()
+            span.nbytes = len(data)
+    except FileNotFoundError:
+        return None
+    return data
+
+def block_etag(obj_hash: str) -> str:
+    return f'"{obj_hash}"'
+
+@app.middleware("http")
+async def reject_writes(request: Request, call_next):
+    if READ_ONLY and (request.method in ("PUT", "DELETE") or request.url.path == "/bundles"):
+        return JSONResponse({"detail": "Server is read-only"}, status_code=403)
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    metrics.observe(
+        request.method,
+        route_path,
+        response.status_code,
+        time.perf_counter() - start,
+        # Chunked uploads have no Content-Length; their handlers count the body.
+        getattr(request.state, "bytes_in", None) or int(request.headers.get("content-length") or 0),
+        int(response.headers.get("content-length") or 0),
+    )
+    return response
+
+def count_sent(chunks: Iterable[bytes], method: str, route: str) -> Iterator[bytes]:
+    """Pass through a streamed response body, counting it in the sent-bytes metric."""
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        metrics.add_bytes(method, route, bytes_out=sent)
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.render() + block_cache.render(), media_type="text/plain; version=0.0.4")
+
 @app.head("/blocks/{obj_hash}")
 async def has_block(obj_hash: str):
     path = get_object_path(obj_hash)
     if os.path.exists(path):
-        return Response(status_code=200)
+        return Response(status_code=200, headers={"ETag": block_etag(obj_hash), **IMMUTABLE_HEADERS})
     raise HTTPException(status_code=404, detail="Block not found")
 
+def write_block(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    existed = os.path.exists(path)
+    with profile.stage("server.write_block", len(data)):
+        atomic_write(path, data)
+    if not existed:
+        metrics.object_added(len(data))
+
+def store_records(records: List[Tuple[str, bytes]]) -> Tuple[int, int]:
+    """Verify and store uploaded bundle records. Returns (stored, skipped)."""
+    stored = skipped = 0
+    for obj_hash, data in records:
+        if hashlib.sha256(data).hexdigest() != obj_hash:
+            raise HTTPException(status_code=400, detail=f"Block {obj_hash} failed verification")
+        path = get_object_path(obj_hash)
+        if os.path.exists(path):
+            skipped += 1
+            continue
+        write_block(path, data)
+        stored += 1
+    return stored, skipped
+
+# Hashing and fsync'ed writes run in the threadpool so they don't stall the
+# event loop (and every other client's requests) during large uploads.
 @app.put("/blocks/{obj_hash}")
 async def upload_block(obj_hash: str, request: Request):
     path = get_object_path(obj_hash)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    
     data = await request.body()
-    with open(path, "wb") as f:
-        f.write(data)
+    await run_in_threadpool(write_block, path, data)
     return {"status": "ok"}
 
+# A plain def runs in the threadpool, so concurrent misses can share one read.
 @app.get("/blocks/{obj_hash}")
-async def download_block(obj_hash: str):
-    path = get_object_path(obj_hash)
-    if not os.path.exists(path):
+def download_block(obj_hash: str, request: Request):
+    check_hash(obj_hash)
+    headers = {"ETag": block_etag(obj_hash), **IMMUTABLE_HEADERS}
+    if request.headers.get("if-none-match") in (headers["ETag"], "*"):
+        if os.path.exists(get_object_path(obj_hash)):
+            return Response(status_code=304, headers=headers)
+    data = block_cache.get(obj_hash, read_block)
+    if data is None:
         raise HTTPException(status_code=404, detail="Block not found")
-    with open(path, "rb") as f:
-        return Response(content=f.read(), media_type="application/octet-stream")
+    return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+@app.post("/blocks/missing")
+async def missing_blocks(request: Request):
+    """Batch existence check: returns which of the given hashes are absent."""
+    hashes = await requested_hashes(request)
+    missing = [h for h in hashes if not os.path.exists(get_object_path(h))]
+    return {"missing": missing}
+
+@app.post("/bundles")
+async def upload_bundle(request: Request):
+    """Receive a framed stream of blocks, verifying and storing each one."""
+    decoder = BundleDecoder()
+    stored = 0
+    skipped = 0
+    request.state.bytes_in = 0
+    try:
+        async for chunk in request.stream():
+            request.state.bytes_in += len(chunk)
+            records = decoder.feed(chunk)
+            if records:
+                counts = await run_in_threadpool(store_records, records)
+                stored += counts[0]
+                skipped += counts[1]
+        decoder.close()
+    except BundleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "stored": stored, "skipped": skipped}
+
+@app.post("/bundles/download")
+async def download_bundle(request: Request):
+    """Stream the requested blocks as one framed bundle. Absent blocks are omitted."""
+    # Validated before the response starts; errors can't be reported mid-stream.
+    hashes = await requested_hashes(request)
+
+    def records():
+        for obj_hash in hashes:
+            data = block_cache.get(obj_hash, read_block)
+            if data is not None:
+                yield obj_hash, data
+
+    body_chunks = count_sent(iter_encode(records()), request.method, "/bundles/download")
+    return StreamingResponse(body_chunks, media_type="application/octet-stream")
 
 @app.put("/manifests/{manifest_hash}")
 async def upload_manifest(manifest_hash: str, request: Request):
-    path = os.path.join(MANIFESTS_DIR, manifest_hash)
+    path = get_manifest_path(manifest_hash)
     data = await request.body()
-    with open(path, "wb") as f:
-        f.write(data)
+    os.makedirs(MANIFESTS_DIR, exist_ok=True)
+    atomic_write(path, data)
     return {"status": "ok"}
 
 @app.get("/manifests/{manifest_hash}")
 async def download_manifest(manifest_hash: str):
-    path = os.path.join(MANIFESTS_DIR, manifest_hash)
+    path = get_manifest_path(manifest_hash)
     if not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Manifest not found")
     with open(path, "rb") as f:
@@ -0,0 +1,135 @@
+import unittest
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import requests
+
+NSHARD = [sys.executable, "-m", "neuroshard.cli"]
+
+# Repeatedly rewrites one file (atomically, as a training job would) and
+# commits. Every worker shares the same 8MB prefix, so blocks dedup across
+# processes while gc runs.
+COMMIT_WORKER = """
+import os, sys, hashlib, random, subprocess
+name, rounds = sys.argv[1], int(sys.argv[2])
+nshard = [sys.executable, "-m", "neuroshard.cli"]
+base = random.Random(0).randbytes(8 * 1024 * 1024)
+for i in range(rounds):
+    data = base + os.urandom(1024 * 1024)
+    with open(name + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(name + ".tmp", name)
+    with open(name + ".versions", "a") as f:
+        f.write(hashlib.sha256(data).hexdigest() + "\\n")
+    if i == 0:
+        subprocess.run(nshard + ["track", name], check=True, stdout=subprocess.DEVNULL)
+    subprocess.run(nshard + ["commit", "-m", f"{name} {i}"], check=True, stdout=subprocess.DEVNULL)
+"""
+
+def sha256_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class TestConcurrentStore(unittest.TestCase):
+    """Many commit, pull and gc processes sharing one .shard store."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.work = os.path.join(self.tmp, "work")
+        os.makedirs(self.work)
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.terminate()
+            self.server.wait()
+        shutil.rmtree(self.tmp)
+
+    def nshard(self, *args, cwd=None):
+        return subprocess.run(NSHARD + list(args), cwd=cwd or self.work, capture_output=True, text=True)
+
+    def start_origin(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        self.server = subprocess.Popen(
+            NSHARD + ["serve", "--store", os.path.join(self.tmp, "origin"), "--host", "127.0.0.1", "--port", str(port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                requests.get(f"{url}/metrics", timeout=1)
+                return url
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        self.fail("Origin server did not start")
+
+    def publish(self, url, names):
+        """Commit and push files from another workspace; return their manifest files."""
+        src = os.path.join(self.tmp, "src")
+        os.makedirs(src)
+        self.assertEqual(self.nshard("init", cwd=src).returncode, 0)
+        contents = {}
+        for name in names:
+            contents[name] = os.urandom(6 * 1024 * 1024)
+            with open(os.path.join(src, name), "wb") as f:
+                f.write(contents[name])
+            self.nshard("track", name, cwd=src)
+        self.assertEqual(self.nshard("commit", "-m", "published", cwd=src).returncode, 0)
+        self.assertEqual(self.nshard("push", "--remote", url, cwd=src).returncode, 0)
+        for name in names:
+            shutil.copy(os.path.join(src, f"{name}.shard.json"), os.path.join(self.work, f"{name}.shard.json"))
+        return contents
+
+    def test_parallel_commit_pull_gc(self):
+        url = self.start_origin()
+        published = self.publish(url, ["pub0.bin", "pub1.bin"])
+        self.assertEqual(self.nshard("init").returncode, 0)
+
+        procs = []
+        for i in range(4):
+            procs.append(subprocess.Popen([sys.executable, "-c", COMMIT_WORKER, f"w{i}.bin", "3"], cwd=self.work,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE))
+        for name in published:
+            procs.append(subprocess.Popen(
+                ["sh", "-c", " && ".join([" ".join(NSHARD + ["pull", "--remote", url, f"{name}.shard.json"])] * 2)],
+                cwd=self.work, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            ))
+        procs.append(subprocess.Popen(
+            ["sh", "-c", " && ".join([" ".join(NSHARD + ["gc"])] * 6)],
+            cwd=self.work, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        ))
+        for proc in procs:
+            _, err = proc.communicate(timeout=300)
+            self.assertEqual(proc.returncode, 0, err.decode())
+
+        # No lost index updates, no dangling references, no torn objects.
+        with open(os.path.join(self.work, ".shard", "index")) as f:
+            self.assertEqual(sorted(json.load(f)), [f"w{i}.bin" for i in range(4)])
+        self.assertEqual(self.nshard("gc").returncode, 0)
+        result = self.nshard("verify")
+        self.assertEqual(result.returncode, 0, result.stdout)
+
+        for i in range(4):
+            out = os.path.join(self.tmp, f"w{i}.out")
+            self.assertEqual(self.nshard("checkout", "-o", out, f"w{i}.bin.shard.json").returncode, 0)
+            with open(os.path.join(self.work, f"w{i}.bin.versions")) as f:
+                self.assertIn(sha256_file(out), f.read().split())
+        for name, data in published.items():
+            out = os.path.join(self.tmp, name)
+            self.assertEqual(self.nshard("checkout", "-o", out, f"{name}.shard.json").returncode, 0)
+            self.assertEqual(sha256_file(out), hashlib.sha256(data).hexdigest())
+
+        for root, _, files in os.walk(os.path.join(self.work, ".shard")):
+            self.assertEqual([f for f in files if f.startswith(".tmp-")], [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,30 @@
 import unittest
 import os
 import shutil
+import io
 import json
+from unittest import mock
 from neuroshard.core.chunker import chunk_file, decompress_chunk
 from neuroshard.core.store import LocalStore
 from neuroshard.core.manifest import create_manifest
+from neuroshard.core.metadb import MetaDB
+from neuroshard.core import profile
+from neuroshard.core.profile import Profiler
+from neuroshard.core.verify import verify_store, VerifyState
+from neuroshard.core.journal import TransferJournal
+from neuroshard.core.remote import RemoteClient
+from neuroshard.core.bundle import iter_encode, iter_decode, BundleDecoder, BundleError, batch_by_size
+from neuroshard.api import Checkpointer
+from neuroshard.core.restore import StreamingCheckout, parse_size
+from neuroshard.core.reflink import BlockCache, checkout_reflinked
+from neuroshard.core.gc import collect_garbage
+from neuroshard.core.tensordiff import block_changes, diff_manifests, BlockReader, read_safetensors_header
+from neuroshard.core.fsutil import atomic_write
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class TestCore(unittest.TestCase):
     def setUp(self):
@@ -47,6 +67,23 @@ class TestCore(unittest.TestCase):
         self.assertTrue(store.has_object(h))
         self.assertEqual(store.read_object(h), data)
 
+    def test_atomic_write_mode(self):
+        # Atomic writes follow the umask like a plain open(), and keep the
+        # mode of a file they replace.
+        old_umask = os.umask(0o022)
+        try:
+            store = LocalStore()
+            store.init()
+            store.write_object("hash123", b"data")
+            self.assertEqual(os.stat(store._get_object_path("hash123")).st_mode & 0o777, 0o644)
+            atomic_write("m.shard.json", b"{}")
+            self.assertEqual(os.stat("m.shard.json").st_mode & 0o777, 0o644)
+            os.chmod("m.shard.json", 0o664)
+            atomic_write("m.shard.json", b"{}")
+            self.assertEqual(os.stat("m.shard.json").st_mode & 0o777, 0o664)
+        finally:
+            os.umask(old_umask)
+
     def test_manifest_creation(self):
         blocks = [{"hash": "h1", "size": 10, "data": b"d1"}]
         meta = {"msg": "test"}
@@ -56,5 +93,339 @@ class TestCore(unittest.TestCase):
         self.assertEqual(manifest["blocks"][0]["hash"], "h1")
         self.assertNotIn("data", manifest["blocks"][0])
 
+    def test_metadb_stats_and_queries(self):
+        store = LocalStore()
+        store.init()
+        db = MetaDB()
+
+        m1 = {"file_path": "a.bin", "meta": {"message": "v1", "created_at": "2025-01-01T00:00:00Z"},
+              "blocks": [{"hash": "h1", "size": 10}, {"hash": "h2", "size": 10}]}
+        m2 = {"file_path": "a.bin", "meta": {"message": "v2", "created_at": "2025-01-02T00:00:00Z"},
+              "blocks": [{"hash": "h1", "size": 10}, {"hash": "h3", "size": 10}]}
+        db.add_manifest("m1", m1, [{"hash": "h1", "compressed_size": 4}, {"hash": "h2", "compressed_size": 5}])
+        db.add_manifest("m2", m2, [{"hash": "h3", "compressed_size": 6}])
+
+        result = db.stats()
+        self.assertEqual(result["manifests"], 2)
+        self.assertEqual(result["logical_bytes"], 40)
+        self.assertEqual(result["unique_bytes"], 30)
+        self.assertEqual(result["physical_bytes"], 15)
+        self.assertEqual(result["shared_blocks"], 1)
+        exclusive = {m["hash"]: m["exclusive_physical_bytes"] for m in result["per_manifest"]}
+        self.assertEqual(exclusive, {"m1": 5, "m2": 6})
+
+        self.assertEqual(db.latest("a.bin")["hash"], "m2")
+        self.assertEqual([m["hash"] for m in db.history("a.bin")], ["m2", "m1"])
+        self.assertEqual([m["hash"] for m in db.manifests_with_block("h1")], ["m2", "m1"])
+        self.assertEqual(db.referenced_blocks(), {"h1", "h2", "h3"})
+
+        db.remove_manifest("m1")
+        self.assertEqual(db.referenced_blocks(), {"h1", "h3"})
+        self.assertEqual(db.prune_blocks(), 1)
+        db.close()
+
+    def test_profiler(self):
+        profiler = Profiler()
+        with profiler.stage("read") as span:
+            span.nbytes = 100
+        with profiler.stage("read", 50):
+            pass
+        profiler.count("blocks", 3)
+        profiler.gauge("queue", 4)
+        profiler.gauge("queue", 1)
+
+        summary = profiler.summary()
+        self.assertEqual(summary["stages"]["read"]["count"], 2)
+        self.assertEqual(summary["stages"]["read"]["bytes"], 150)
+        self.assertEqual(summary["counters"]["blocks"], 3)
+        self.assertEqual(summary["gauges"]["queue"], {"last": 1, "max": 4})
+        self.assertEqual(len(profiler.chrome_trace()["traceEvents"]), 2)
+
+    def test_verify_store(self):
+        with open("test.bin", "wb") as f:
+            f.write(os.urandom(1000))
+        store = LocalStore()
+        store.init()
+        blocks = chunk_file("test.bin")
+        for block in blocks:
+            store.write_object(block["hash"], block["data"])
+        mhash, _, manifest_bytes = create_manifest("test.bin", blocks, {})
+        store.write_manifest(mhash, manifest_bytes)
+
+        report = verify_store(store)
+        self.assertEqual(report["problems"], {})
+        self.assertEqual(report["checked"], 1)
+
+        # Corrupt the object on disk
+        h = blocks[0]["hash"]
+        with open(store._get_object_path(h), "wb") as f:
+            f.write(b"garbage")
+        report = verify_store(store)
+        self.assertEqual(report["problems"], {h: "hash mismatch"})
+
+        # Objects recorded by an interrupted run are skipped on resume
+        VerifyState().save({h})
+        report = verify_store(store)
+        self.assertEqual(report["resumed"], 1)
+        self.assertEqual(report["checked"], 0)
+
+        # Repairs overwrite the corrupt object in place, never removing it first
+        remote = mock.Mock()
+        remote.download_block.return_value = blocks[0]["data"]
+        with mock.patch.object(store, "remove_object") as remove:
+            report = verify_store(store, remote=remote)
+        remove.assert_not_called()
+        self.assertEqual(report["problems"], {})
+        self.assertEqual(store.read_object(h), blocks[0]["data"])
+
+    def test_transfer_journal(self):
+        h1, h2 = "a" * 64, "b" * 64
+        journal = TransferJournal("push", "http://remote", "m1")
+        journal.record(h1)
+        journal.record(h2)
+        journal.close()
+
+        self.assertEqual(TransferJournal("push", "http://remote", "m1").load(), {h1, h2})
+        self.assertEqual(TransferJournal("pull", "http://remote", "m1").load(), set())
+
+        journal.complete()
+        self.assertEqual(TransferJournal("push", "http://remote", "m1").load(), set())
+
+    def test_remote_retries_transient_errors(self):
+        client = RemoteClient("http://remote", retries=2, backoff=0)
+        flaky = mock.Mock(status_code=503)
+        ok = mock.Mock(status_code=200, content=b"data")
+        with mock.patch.object(client.session, "request", side_effect=[flaky, ok]) as request:
+            self.assertEqual(client.download_block("h"), b"data")
+        self.assertEqual(request.call_count, 2)
+
+    def test_remote_times_out_stalled_connections(self):
+        import socket
+        import requests
+        from neuroshard.core.remote import ORIGIN_TIMEOUT
+        self.assertEqual(RemoteClient("http://remote").timeout, ORIGIN_TIMEOUT)
+
+        # A server that accepts connections and never answers.
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen(8)
+            client = RemoteClient(f"http://127.0.0.1:{server.getsockname()[1]}", retries=1, backoff=0,
+                                  timeout=(1, 0.2))
+            with mock.patch.object(client.session, "request", wraps=client.session.request) as request:
+                with self.assertRaises(requests.Timeout):
+                    client.download_block("a" * 64)
+            self.assertEqual(request.call_count, 2)
+
+        # A bundle stream that times out is resumed for the blocks not yet received.
+        client = RemoteClient("http://remote", retries=1, backoff=0)
+        calls = []
+
+        blocks = {"a" * 64: b"first", "b" * 64: b"second"}
+
+        def stream(hashes):
+            calls.append(list(hashes))
+            for i, h in enumerate(hashes):
+                if len(calls) == 1 and i == 1:
+                    raise requests.Timeout("stalled")
+                yield h, blocks[h]
+
+        with mock.patch.object(client, "_stream_bundle", side_effect=stream):
+            received = dict(client.download_bundle(["a" * 64, "b" * 64]))
+        self.assertEqual(received, blocks)
+        self.assertEqual(calls, [["a" * 64, "b" * 64], ["b" * 64]])
+
+    def test_remote_falls_back_without_batch_endpoints(self):
+        # A server predating /blocks/missing and /bundles: 405 and 404 on those routes.
+        blocks = {"a" * 64: b"first"}
+        uploaded = {}
+
+        def old_server(method, url, **kwargs):
+            path = url[len("http://remote"):]
+            if path == "/blocks/missing":
+                return mock.Mock(status_code=405)
+            if path.startswith("/bundles"):
+                return mock.Mock(status_code=404)
+            h = path.rsplit("/", 1)[1]
+            if method == "PUT":
+                uploaded[h] = kwargs["data"]
+                return mock.Mock(status_code=200)
+            if h not in blocks:
+                return mock.Mock(status_code=404, content=b"")
+            return mock.Mock(status_code=200, content=blocks[h])
+
+        client = RemoteClient("http://remote", retries=0)
+        with mock.patch.object(client.session, "request", side_effect=old_server) as request:
+            self.assertEqual(client.missing_blocks(["a" * 64, "b" * 64]), ["b" * 64])
+            self.assertEqual(list(client.download_bundle(["a" * 64, "b" * 64])), [("a" * 64, b"first")])
+            client.upload_bundle(lambda: [("b" * 64, b"second")])
+        self.assertEqual(uploaded, {"b" * 64: b"second"})
+        # The batch endpoints are only probed once.
+        paths = [c.args[1] for c in request.call_args_list]
+        self.assertEqual(paths.count("http://remote/blocks/missing"), 1)
+        self.assertNotIn("http://remote/bundles/download", paths)
+        self.assertNotIn("http://remote/bundles", paths)
+
+    def test_bundle_roundtrip(self):
+        records = [("a" * 64, b"first"), ("b" * 64, b""), ("c" * 64, os.urandom(5000))]
+        encoded = b"".join(iter_encode(records))
+        self.assertEqual(list(iter_decode(io.BytesIO(encoded), chunk_size=7)), records)
+
+        decoder = BundleDecoder()
+        decoder.feed(encoded[:-1])
+        with self.assertRaises(BundleError):
+            decoder.close()
+
+        batches = list(batch_by_size(["x", "y", "z"], lambda h: 10, max_bytes=20))
+        self.assertEqual(batches, [["x", "y"], ["z"]])
+
+    def test_checkpointer_commit_async(self):
+        content = os.urandom(1000) + b"\0" * (5 * 1024 * 1024)
+        remote = mock.Mock()
+        remote.has_block.return_value = False
+        with mock.patch("neuroshard.core.remote.RemoteClient", return_value=remote):
+            with Checkpointer(remote="http://remote", max_pending_bytes=1) as ckpt:
+                future = ckpt.commit_async(memoryview(content), file_path="model.bin", message="step 1")
+                result = future.result()
+                self.assertEqual(result.uploaded.result(), result.manifest_hash)
+
+        store = LocalStore()
+        blocks = result.manifest["blocks"]
+        self.assertEqual(len(blocks), 2)
+        self.assertEqual(b"".join(decompress_chunk(store.read_object(b["hash"])) for b in blocks), content)
+        self.assertTrue(os.path.exists("model.bin.shard.json"))
+        self.assertEqual(MetaDB().latest("model.bin")["message"], "step 1")
+
+        self.assertEqual(remote.upload_block.call_count, 2)
+        remote.upload_manifest.assert_called_once()
+        self.assertEqual(remote.upload_manifest.call_args[0][0], result.manifest_hash)
+
+        with self.assertRaises(ValueError):
+            Checkpointer().commit_async(b"data")
+
+    def test_streaming_checkout_priority(self):
+        import struct
+        mb = 1024 * 1024
+        tensors = {"a.weight": [0, 6 * mb], "b.weight": [6 * mb, 10 * mb], "c.weight": [10 * mb, 13 * mb]}
+        header = json.dumps({k: {"dtype": "U8", "shape": [e - s], "data_offsets": [s, e]}
+                             for k, (s, e) in tensors.items()}).encode()
+        content = struct.pack("<Q", len(header)) + header + os.urandom(13 * mb)
+        with open("model.safetensors", "wb") as f:
+            f.write(content)
+        blocks = chunk_file("model.safetensors")
+        _, manifest, _ = create_manifest("restored.safetensors", blocks, {})
+        remote_blocks = {b["hash"]: b["data"] for b in blocks}
+
+        client = mock.Mock()
+        client.download_block.side_effect = lambda h: remote_blocks[h]
+        client.download_bundle.side_effect = lambda hashes: [(h, remote_blocks[h]) for h in hashes]
+
+        order = []
+        checkout = StreamingCheckout(manifest, LocalStore(), client, workers=1, batch_blocks=1, on_block=order.append)
+        profiler = Profiler()
+        with mock.patch.object(profile, "_enabled", True), mock.patch.object(profile, "profiler", profiler):
+            stats = checkout.run("restored.safetensors", priority=["header", "c.*"])
+        # The header block is fetched up front; the other three are queued as batches.
+        self.assertEqual(profiler.summary()["gauges"]["restore.pending_batches"], {"last": 0, "max": 3})
+
+        with open("restored.safetensors", "rb") as f:
+            self.assertEqual(f.read(), content)
+        hashes = [b["hash"] for b in blocks]
+        self.assertEqual(order, [hashes[0], hashes[2], hashes[3], hashes[1]])
+        self.assertEqual(stats["downloaded"], 4)
+        self.assertIsNotNone(stats["priority_ready"])
+        self.assertFalse(os.path.exists("restored.safetensors.partial"))
+        self.assertEqual(parse_size("64M"), 64 * mb)
+
+    def test_reflink_checkout_and_cache_gc(self):
+        store = LocalStore()
+        store.init()
+        content = os.urandom(5 * 1024 * 1024)
+        with open("model.bin", "wb") as f:
+            f.write(content)
+        blocks = chunk_file("model.bin")
+        for block in blocks:
+            store.write_object(block["hash"], block["data"])
+        mhash, manifest, manifest_bytes = create_manifest("model.bin", blocks, {})
+        store.write_manifest(mhash, manifest_bytes)
+
+        # Clones where the filesystem supports it, copies otherwise.
+        for out in ("v1.bin", "v2.bin"):
+            counts = checkout_reflinked(manifest, store, out)
+            self.assertEqual(counts["cloned"] + counts["copied"], len(blocks))
+            with open(out, "rb") as f:
+                self.assertEqual(f.read(), content)
+
+        cache = BlockCache(store)
+        self.assertEqual(sorted(cache.hashes()), sorted(b["hash"] for b in blocks))
+        os.remove(os.path.join(store.manifests_dir, mhash))
+        collect_garbage()
+        self.assertEqual(list(cache.hashes()), [])
+
+    def test_block_changes_by_position(self):
+        a, b, c = {"hash": "a"}, {"hash": "b"}, {"hash": "c"}
+        self.assertEqual(block_changes([a, b, a], [b, a, a, c]),
+                         {"unchanged": 1, "changed": 2, "added": 1, "removed": 0})
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_tensor_diff(self):
+        import struct
+        store = LocalStore()
+        store.init()
+
+        def commit(tensors, name):
+            header, offset, payload = {}, 0, b""
+            for tname, arr in tensors.items():
+                data = arr.tobytes()
+                header[tname] = {"dtype": "F32", "shape": list(arr.shape), "data_offsets": [offset, offset + len(data)]}
+                offset += len(data)
+                payload += data
+            raw = json.dumps(header).encode()
+            with open(name, "wb") as f:
+                f.write(struct.pack("<Q", len(raw)) + raw + payload)
+            blocks = chunk_file(name)
+            for block in blocks:
+                store.write_object(block["hash"], block["data"])
+            return create_manifest(name, blocks, {})[1]
+
+        rng = np.random.default_rng(0)
+        frozen = rng.standard_normal(3 * 1024 * 1024, dtype=np.float32)
+        head = rng.standard_normal(1000, dtype=np.float32)
+        old = commit({"frozen": frozen, "head": head}, "old.safetensors")
+        tuned = head.copy()
+        tuned[:10] += 0.5
+        new = commit({"frozen": frozen, "head": tuned}, "new.safetensors")
+
+        report = diff_manifests(old, new, store)
+        self.assertEqual(report["format"], "safetensors")
+        regions = {r["name"]: r for r in report["regions"]}
+        self.assertEqual(regions["frozen"]["status"], "unchanged")
+        self.assertEqual(regions["head"]["changed"], 10)
+        self.assertAlmostEqual(regions["head"]["changed_fraction"], 0.01)
+        self.assertAlmostEqual(regions["head"]["max_abs_delta"], 0.5, places=5)
+        self.assertAlmostEqual(regions["head"]["l2_delta"], (10 * 0.25) ** 0.5, places=4)
+        # Only the header/head blocks are read, not the middle of "frozen"
+        self.assertLess(report["summary"]["blocks_decompressed"], len(old["blocks"]) + len(new["blocks"]))
+
+        # A new tensor shifts every offset; tensors are still matched by name.
+        grown = commit({"frozen": frozen, "head": head, "extra": np.zeros(4, dtype=np.float32)}, "grown.safetensors")
+        report = diff_manifests(old, grown, store)
+        self.assertEqual(report["added"], ["extra"])
+        self.assertEqual(report["summary"]["changed_regions"], 0)
+
+    def test_raw_file_not_read_as_safetensors_header(self):
+        # The first 8 bytes decode to a plausible header length, but the file
+        # is not safetensors: only the first block may be decompressed.
+        import struct
+        with open("raw.bin", "wb") as f:
+            f.write(struct.pack("<Q", 9 * 1024 * 1024) + os.urandom(12 * 1024 * 1024))
+        store = LocalStore()
+        store.init()
+        blocks = chunk_file("raw.bin")
+        for block in blocks:
+            store.write_object(block["hash"], block["data"])
+        reader = BlockReader(create_manifest("raw.bin", blocks, {})[1], store)
+        self.assertIsNone(read_safetensors_header(reader))
+        self.assertEqual(reader.decompressed, 1)
+
 if __name__ == "__main__":
     unittest.main()
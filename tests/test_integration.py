@@ -55,5 +55,104 @@ class TestIntegration(unittest.TestCase):
             content = f.read()
             self.assertTrue(content.startswith("Hello World"))
 
+    def test_stats_json(self):
+        self.runner.invoke(app, ["init"])
+        with open("data.bin", "wb") as f:
+            f.write(b"abc" * 1000)
+        self.runner.invoke(app, ["track", "data.bin"])
+        self.runner.invoke(app, ["commit", "-m", "v1"])
+        self.runner.invoke(app, ["commit", "-m", "v2"])
+
+        result = self.runner.invoke(app, ["stats", "--json"])
+        self.assertEqual(result.exit_code, 0)
+        stats = json.loads(result.stdout)
+        self.assertEqual(stats["manifests"], 2)
+        self.assertEqual(stats["blocks"], 1)
+        self.assertEqual(stats["logical_bytes"], 6000)
+        self.assertAlmostEqual(stats["dedup_ratio"], 2.0)
+
+    def test_log(self):
+        self.runner.invoke(app, ["init"])
+        with open("data.bin", "wb") as f:
+            f.write(b"v1")
+        self.runner.invoke(app, ["track", "data.bin"])
+        self.runner.invoke(app, ["commit", "-m", "first"])
+        with open("data.bin", "wb") as f:
+            f.write(b"v2")
+        self.runner.invoke(app, ["commit", "-m", "second"])
+
+        result = self.runner.invoke(app, ["log", "--json", "data.bin"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual([m["message"] for m in json.loads(result.stdout)], ["second", "first"])
+
+    def test_queries_outside_repository(self):
+        # Read-only commands must not create .shard where there is none.
+        result = self.runner.invoke(app, ["log"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("No manifests found.", result.stdout)
+        result = self.runner.invoke(app, ["stats"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("nshard init", result.stdout)
+        self.assertFalse(os.path.exists(".shard"))
+
+    def test_export_import(self):
+        self.runner.invoke(app, ["init"])
+        with open("data.bin", "wb") as f:
+            f.write(os.urandom(5000))
+        self.runner.invoke(app, ["track", "data.bin"])
+        self.runner.invoke(app, ["commit", "-m", "v1"])
+
+        result = self.runner.invoke(app, ["export", "bundle.nsa"])
+        self.assertEqual(result.exit_code, 0)
+
+        # Import into a fresh repository
+        os.makedirs("clone")
+        os.chdir("clone")
+        result = self.runner.invoke(app, ["import", "../bundle.nsa"])
+        self.assertEqual(result.exit_code, 0)
+        result = self.runner.invoke(app, ["checkout", "data.bin.shard.json"])
+        self.assertEqual(result.exit_code, 0)
+        with open("data.bin", "rb") as a, open("../data.bin", "rb") as b:
+            self.assertEqual(a.read(), b.read())
+
+        # Nothing is re-sent for blocks the destination already has
+        self.runner.invoke(app, ["import", "--write-have", "have.txt"])
+        os.chdir("..")
+        self.runner.invoke(app, ["export", "--have", "clone/have.txt", "inc.nsa"])
+        self.assertLess(os.path.getsize("inc.nsa"), 1000)
+
+    def test_import_corrupt_archive(self):
+        self.runner.invoke(app, ["init"])
+        with open("data.bin", "wb") as f:
+            f.write(os.urandom(5000))
+        self.runner.invoke(app, ["track", "data.bin"])
+        self.runner.invoke(app, ["commit", "-m", "v1"])
+        self.runner.invoke(app, ["export", "bundle.nsa"])
+        with open("bundle.nsa", "rb") as f:
+            data = bytearray(f.read())
+
+        flipped = bytearray(data)
+        flipped[-100] ^= 1
+        header_end = 12 + int.from_bytes(data[4:12], "big")
+        corrupt = {
+            "flipped.nsa": bytes(flipped),
+            "truncated.nsa": bytes(data[:-100]),
+            "empty.nsa": b"",
+            "header.nsa": bytes(data[:12]) + b"x" + bytes(data[13:]),
+            # Valid, but without the blocks (as if exported with a stale --have)
+            "no_blocks.nsa": bytes(data[:header_end + 4]),
+        }
+        os.makedirs("clone")
+        os.chdir("clone")
+        self.runner.invoke(app, ["init"])
+        for name, content in corrupt.items():
+            with open(name, "wb") as f:
+                f.write(content)
+            result = self.runner.invoke(app, ["import", name])
+            self.assertEqual(result.exit_code, 1, name)
+            self.assertIn("Error:", result.stdout, name)
+            self.assertFalse(os.path.exists("data.bin.shard.json"), name)
+            self.assertEqual(os.listdir(".shard/manifests"), [], name)
+
 if __name__ == "__main__":
     unittest.main()
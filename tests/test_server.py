@@ -0,0 +1,297 @@
+import unittest
+import os
+import io
+import shutil
+import tempfile
+from unittest import mock
+import hashlib
+import threading
+import time
+import socket
+import subprocess
+import sys
+import json
+import requests
+from typer.testing import CliRunner
+from neuroshard.cli import app
+from neuroshard.core.bundle import iter_encode, iter_decode
+from neuroshard.server import app as server
+from neuroshard.core.remote import RemoteClient
+
+try:
+    from fastapi.testclient import TestClient
+except ImportError:  # TestClient needs httpx
+    TestClient = None
+
+@unittest.skipIf(TestClient is None, "httpx not installed")
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.storage = tempfile.mkdtemp()
+        objects_dir = os.path.join(self.storage, "objects")
+        manifests_dir = os.path.join(self.storage, "manifests")
+        os.makedirs(objects_dir)
+        os.makedirs(manifests_dir)
+        self.patches = [
+            mock.patch.object(server, "OBJECTS_DIR", objects_dir),
+            mock.patch.object(server, "MANIFESTS_DIR", manifests_dir),
+            mock.patch.object(server, "metrics", server.ServerMetrics()),
+            mock.patch.object(server, "block_cache", server.HotBlockCache(1024 * 1024)),
+        ]
+        for p in self.patches:
+            p.start()
+        self.client = TestClient(server.app)
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.storage)
+
+    def test_metrics_endpoint(self):
+        self.client.get("/blocks/" + "0" * 64)
+        resp = self.client.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        body = resp.text
+        self.assertIn('neuroshard_requests_total{method="GET",route="/blocks/{obj_hash}",status="404"}', body)
+        self.assertIn("neuroshard_request_duration_seconds_bucket", body)
+        self.assertIn("neuroshard_store_objects", body)
+
+    def test_bundle_upload_and_download(self):
+        blocks = [b"bundle block %d" % i for i in range(3)]
+        records = [(hashlib.sha256(b).hexdigest(), b) for b in blocks]
+        hashes = [h for h, _ in records]
+
+        resp = self.client.post("/blocks/missing", json={"hashes": hashes})
+        self.assertEqual(resp.json()["missing"], hashes)
+
+        # A generator body is sent chunked, without Content-Length, as push does.
+        body = b"".join(iter_encode(records))
+        resp = self.client.post("/bundles", content=iter_encode(records))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["stored"], 3)
+
+        resp = self.client.post("/blocks/missing", json={"hashes": hashes})
+        self.assertEqual(resp.json()["missing"], [])
+
+        resp = self.client.post("/bundles/download", json={"hashes": hashes + ["0" * 64]})
+        self.assertEqual(list(iter_decode(io.BytesIO(resp.content))), records)
+
+        text = self.client.get("/metrics").text
+        self.assertIn(f'neuroshard_bytes_received_total{{method="POST",route="/bundles"}} {len(body)}', text)
+        self.assertIn(f'neuroshard_bytes_sent_total{{method="POST",route="/bundles/download"}} {len(body)}', text)
+
+    def test_bundle_rejects_bad_hash(self):
+        resp = self.client.post("/bundles", content=b"".join(iter_encode([("0" * 64, b"data")])))
+        self.assertEqual(resp.status_code, 400)
+
+    def test_uploads_write_off_the_event_loop(self):
+        import asyncio
+        on_loop = []
+
+        def write(path, data):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(path)
+            except RuntimeError:
+                pass
+
+        blocks = [b"loop block %d" % i for i in range(3)]
+        records = [(hashlib.sha256(b).hexdigest(), b) for b in blocks]
+        with mock.patch.object(server, "atomic_write", side_effect=write) as atomic_write:
+            self.client.put(f"/blocks/{records[0][0]}", content=records[0][1])
+            self.client.post("/bundles", content=b"".join(iter_encode(records[1:])))
+        self.assertEqual(atomic_write.call_count, 3)
+        self.assertEqual(on_loop, [])
+
+    def test_serve_configures_imported_server(self):
+        # The server module is already imported here, so --store must be applied via configure().
+        store = os.path.join(self.storage, "served")
+        with mock.patch.object(server, "STORAGE_DIR", server.STORAGE_DIR), \
+                mock.patch.object(server, "READ_ONLY", False), \
+                mock.patch("uvicorn.run") as run:
+            result = CliRunner().invoke(app, ["serve", "--store", store, "--read-only"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            run.assert_called_once()
+            self.assertEqual(server.OBJECTS_DIR, os.path.join(store, "objects"))
+            self.assertTrue(server.READ_ONLY)
+            self.assertTrue(os.path.isdir(os.path.join(store, "manifests")))
+
+    def test_rejects_paths_as_hashes(self):
+        # Hashes name files under the store; anything else must not reach the filesystem.
+        with mock.patch.object(server, "read_block", side_effect=AssertionError("read")):
+            for bad in ["/etc/hostname", "/dev/zero", "../" * 3 + "etc/hostname", "A" * 64, 5]:
+                resp = self.client.post("/blocks/missing", json={"hashes": [bad]})
+                self.assertEqual(resp.status_code, 400, bad)
+                resp = self.client.post("/bundles/download", json={"hashes": [bad]})
+                self.assertEqual(resp.status_code, 400, bad)
+            self.assertEqual(self.client.get("/blocks/not-a-hash").status_code, 400)
+            self.assertEqual(self.client.get("/manifests/not-a-hash").status_code, 400)
+            self.assertEqual(self.client.post("/blocks/missing", json={"hashes": "x"}).status_code, 400)
+
+    def test_block_cache_headers(self):
+        data = b"hot block"
+        h = hashlib.sha256(data).hexdigest()
+        self.client.put(f"/blocks/{h}", content=data)
+
+        first = self.client.get(f"/blocks/{h}")
+        self.assertEqual(first.content, data)
+        self.assertEqual(first.headers["etag"], f'"{h}"')
+        self.assertIn("immutable", first.headers["cache-control"])
+
+        self.assertEqual(self.client.get(f"/blocks/{h}").content, data)
+        self.assertEqual((server.block_cache.misses, server.block_cache.hits), (1, 1))
+
+        resp = self.client.get(f"/blocks/{h}", headers={"If-None-Match": first.headers["etag"]})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b"")
+        self.assertEqual(self.client.get("/blocks/" + "0" * 64).status_code, 404)
+        self.assertIn("neuroshard_cache_hits_total 1", self.client.get("/metrics").text)
+
+    def test_block_cache_coalesces_and_evicts(self):
+        cache = server.HotBlockCache(10)
+        reads = []
+        release = threading.Event()
+
+        def slow_load(h):
+            reads.append(h)
+            release.wait(5)
+            return b"12345678"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("a", slow_load))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        while cache.coalesced < 7:
+            time.sleep(0.01)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(reads, ["a"])
+        self.assertEqual(results, [b"12345678"] * 8)
+
+        cache.get("b", lambda h: b"abcd")  # Exceeds 10 bytes: evicts "a"
+        self.assertEqual(cache.get("a", lambda h: b"reloaded"), b"reloaded")
+        self.assertIsNone(cache.get("missing", lambda h: None))
+
+class ServerProcessTestCase(unittest.TestCase):
+    """Runs `nshard serve` processes, each with its own store under a temp dir."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.procs = []
+
+    def tearDown(self):
+        for proc in self.procs:
+            proc.terminate()
+            proc.wait()
+        shutil.rmtree(self.tmp)
+
+    def start_server(self, name, read_only=False):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        store = os.path.join(self.tmp, name)
+        args = [sys.executable, "-m", "neuroshard.cli", "serve", "--store", store,
+                "--host", "127.0.0.1", "--port", str(port)]
+        if read_only:
+            args.append("--read-only")
+        self.procs.append(subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                requests.get(f"{url}/metrics", timeout=1)
+                return url
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        self.fail(f"Server {name} did not start")
+
+    def place(self, name, obj_hash, data):
+        path = os.path.join(self.tmp, name, "objects", obj_hash[:2], obj_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+class TestPeers(ServerProcessTestCase):
+    """Origin plus two read-only peers, each a separate `nshard serve` process."""
+
+    def setUp(self):
+        super().setUp()
+        self.origin = self.start_server("origin")
+        self.good_peer = self.start_server("good", read_only=True)
+        self.bad_peer = self.start_server("bad", read_only=True)
+
+    def test_pull_from_peers(self):
+        blocks = {}
+        for i in range(24):
+            data = b"peer block %d" % i
+            blocks[hashlib.sha256(data).hexdigest()] = data
+        origin = RemoteClient(self.origin)
+        for h, data in blocks.items():
+            origin.upload_block(h, data)
+            self.place("good", h, data)
+            self.place("bad", h, b"corrupted")
+
+        client = RemoteClient(self.origin, peers=[self.good_peer, self.bad_peer], backoff=0)
+        good, bad = client.peers
+        assigned = {h: client._peer_for(h) for h in blocks}
+        self.assertTrue(any(p is good for p in assigned.values()))
+        self.assertTrue(any(p is bad for p in assigned.values()))
+
+        self.assertEqual(dict(client.download_bundle(list(blocks))), blocks)
+        self.assertEqual(good.down_until, 0.0)
+        self.assertGreater(bad.down_until, 0.0)  # Corrupt data: skipped from now on
+        for h, data in blocks.items():
+            self.assertEqual(client.download_block(h), data)
+
+        resp = requests.get(f"{self.good_peer}/metrics").text
+        self.assertIn('route="/bundles/download",status="200"', resp)
+        self.assertEqual(requests.put(f"{self.good_peer}/blocks/{'0' * 64}", data=b"x").status_code, 403)
+
+class TestPushResume(ServerProcessTestCase):
+    def setUp(self):
+        super().setUp()
+        self.remote = self.start_server("remote")
+        self.original_cwd = os.getcwd()
+        os.chdir(self.tmp)
+
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+        super().tearDown()
+
+    def test_interrupted_push_resumes(self):
+        runner = CliRunner()
+        runner.invoke(app, ["init"])
+        with open("data.bin", "wb") as f:
+            f.write(os.urandom(3 * 4 * 1024 * 1024))
+        runner.invoke(app, ["track", "data.bin"])
+        runner.invoke(app, ["commit", "-m", "v1"])
+        with open("data.bin.shard.json") as f:
+            hashes = [b["hash"] for b in json.load(f)["blocks"]]
+
+        # The connection drops after the first block is uploaded.
+        upload_block = RemoteClient.upload_block
+        calls = []
+
+        def flaky_upload(client, obj_hash, data):
+            calls.append(obj_hash)
+            if len(calls) > 1:
+                raise requests.ConnectionError("connection reset")
+            upload_block(client, obj_hash, data)
+
+        with mock.patch.object(RemoteClient, "upload_block", flaky_upload):
+            result = runner.invoke(app, ["push", "--remote", self.remote])
+        self.assertNotEqual(result.exit_code, 0)
+
+        # The re-run only asks the remote about blocks the journal doesn't cover.
+        with mock.patch.object(RemoteClient, "missing_blocks", autospec=True,
+                               side_effect=RemoteClient.missing_blocks) as missing:
+            result = runner.invoke(app, ["push", "--remote", self.remote])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Resuming: 1 blocks already pushed.", result.output)
+        self.assertEqual(missing.call_args.args[1], [h for h in hashes if h != calls[0]])
+        for h in hashes:
+            self.assertTrue(os.path.exists(os.path.join(self.tmp, "remote", "objects", h[:2], h)))
+        self.assertEqual(os.listdir(os.path.join(".shard", "journal")), [])
+
+if __name__ == "__main__":
+    unittest.main()
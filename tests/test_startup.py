@@ -0,0 +1,74 @@
+import unittest
+import sys
+import shutil
+import tempfile
+import subprocess
+
+# Modules that must not be imported by lightweight commands.
+HEAVY_MODULES = ("requests", "zstandard", "fastapi", "uvicorn")
+
+RUNNER = """
+import sys, atexit
+atexit.register(lambda: sys.stderr.write("MODULES " + " ".join(sorted(sys.modules)) + "\\n"))
+from neuroshard.cli import app
+sys.argv = ["nshard", *sys.argv[1:]]
+app()
+"""
+
+def run_cli(args, cwd):
+    """
+    Run `nshard <args>` under -X importtime.
+    Returns (exit code, set of loaded modules, total import time in microseconds).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUNNER, *args],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    modules = set()
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if line.startswith("MODULES "):
+            modules = set(line.split()[1:])
+        elif line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            # Top-level imports (no indentation) sum to the total.
+            if cumulative.strip().isdigit() and not name.startswith("  "):
+                total_us += int(cumulative)
+    return proc.returncode, modules, total_us
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_light_commands_skip_heavy_imports(self):
+        for args in (["init"], ["status"], ["log"], ["git-init"]):
+            code, modules, total_us = run_cli(args, self.test_dir)
+            self.assertEqual(code, 0, args)
+            heavy = [m for m in HEAVY_MODULES if m in modules]
+            self.assertEqual(
+                heavy, [],
+                f"nshard {' '.join(args)} imported {heavy} (import time {total_us / 1000:.0f} ms)",
+            )
+
+    def test_commands_load_on_demand(self):
+        code, modules, _ = run_cli(["status"], self.test_dir)
+        self.assertEqual(code, 0)
+        self.assertIn("neuroshard.commands.status", modules)
+        self.assertNotIn("neuroshard.commands.push", modules)
+
+    def test_completion_options_only_on_top_level(self):
+        from typer.testing import CliRunner
+        from neuroshard.cli import app, COMMANDS
+        runner = CliRunner()
+        self.assertIn("--install-completion", runner.invoke(app, ["--help"]).stdout)
+        for name in COMMANDS:
+            result = runner.invoke(app, [name, "--help"])
+            self.assertEqual(result.exit_code, 0, name)
+            self.assertNotIn("--install-completion", result.stdout, name)
+            self.assertNotIn("--show-completion", result.stdout, name)
+
+if __name__ == "__main__":
+    unittest.main()